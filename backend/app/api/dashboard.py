@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends
-from sqlmodel import select, Session
+from datetime import date
+from typing import List, Optional
 
-from ..db import get_session
-from ..models.document import Document
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..db import get_async_session
+from app.services.cache import corpus_version, etag_matches, make_etag, response_cache
 from app.services.dashboard import build_dashboard
 from app.core.logging import log
 
@@ -10,9 +14,70 @@ router = APIRouter()
 
 
 @router.get("/dashboard")
-def dashboard(session: Session = Depends(get_session)):
+async def dashboard(request: Request, response: Response, session: AsyncSession = Depends(get_async_session)):
     log.info("dashboard_request")
-    docs = list(session.exec(select(Document)))
-    resp = build_dashboard(docs)
-    log.info("dashboard_response", documents=len(docs), has_stats=bool(resp))
+    version = await session.run_sync(corpus_version)
+    etag = make_etag(version, "dashboard")
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        log.info("dashboard_not_modified")
+        return Response(status_code=304, headers=headers)
+
+    resp = response_cache.get(etag)
+    if resp is None:
+        resp = await session.run_sync(build_dashboard)
+        # The reads are separate SQLite transactions: if a chunk committed in
+        # between, these counts are newer than `etag` and must not be kept under it.
+        if await session.run_sync(corpus_version) == version:
+            response_cache.put(etag, resp)
+        else:
+            log.info("dashboard_version_moved", version=version)
+            headers = {"Cache-Control": "no-store"}
+    response.headers.update(headers)
+    log.info("dashboard_response", documents=resp["count_documents"], has_stats=bool(resp))
+    return resp
+
+
+@router.get("/dashboard/facets")
+async def dashboard_facets(
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session),
+    agreement_type: List[str] = Query([], description="Any of these agreement types"),
+    governing_law: List[str] = Query([], description="Any of these jurisdictions"),
+    geography: List[str] = Query([], description="Any of these geographies"),
+    industry: List[str] = Query([], description="Any of these industries"),
+    year: Optional[int] = Query(None, ge=1970, le=9999, description="Documents created in this year"),
+    date_from: Optional[date] = Query(None, description="Created on or after this day"),
+    date_to: Optional[date] = Query(None, description="Created before this day"),
+    cross: Optional[str] = Query(None, description="Two columns to cross-tabulate, e.g. industry,governing_law"),
+):
+    """Facet counts for documents matching every filter (values within a filter are alternatives)."""
+    from app.services.facets import COLUMNS, get_facet_index  # numpy: loaded on first use
+
+    given = {"agreement_type": agreement_type, "governing_law": governing_law, "geography": geography, "industry": industry}
+    filters = {c: vs for c, vs in given.items() if vs}
+    pair = None
+    if cross:
+        pair = tuple(c.strip() for c in cross.split(","))
+        if len(pair) != 2 or pair[0] == pair[1] or not set(pair) <= set(COLUMNS):
+            raise HTTPException(status_code=400, detail=f"cross takes two different columns of: {', '.join(COLUMNS)}")
+    if year is not None:
+        date_from = max(date_from or date.min, date(year, 1, 1))
+        date_to = min(date_to or date.max, date(year + 1, 1, 1)) if year < 9999 else date_to
+    log.info("dashboard_facets_request", filters=filters, date_from=date_from, date_to=date_to, cross=cross)
+
+    version = await session.run_sync(corpus_version)
+    etag = make_etag(version, "facets", sorted(filters.items()), date_from, date_to, pair)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    index = get_facet_index()
+    if index.version != version:
+        await run_in_threadpool(index.catch_up, version)  # a cold load takes seconds on a large corpus
+    resp = index.query(filters, date_from, date_to, pair)
+    resp["filters"] = {**filters, "date_from": date_from, "date_to": date_to}
+    response.headers.update(headers)
+    log.info("dashboard_facets_response", documents=resp["count_documents"])
     return resp
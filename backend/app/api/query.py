@@ -1,14 +1,20 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Literal, NamedTuple, Optional, Tuple
+import base64
 import re
 
-from fastapi import APIRouter, Depends, Query
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy import func, or_
+from sqlalchemy import ColumnElement, and_, func, or_
 from sqlmodel import select, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..db import get_session
+from ..db import async_engine, get_async_session
 from ..models.document import Document
 from ..utils.nlp_simple import extract_filters
+from ..services.search import any_term, column_any, fetch_ranked, fts_available, has_match, recent_ids, search_ids
+from ..services.cache import corpus_version, etag_matches, make_etag, query_parse_cache, query_result_cache
 from app.core.logging import log
 
 router = APIRouter()
@@ -29,45 +35,57 @@ def ping():
     return {"ok": True}
 
 
-def _find_docs(question: str, session: Session, limit: int) -> List[DocHit]:
-    """
-    Loose matching:
-      - If NLP extracted governing_law/geography -> use case-insensitive CONTAINS (not exact).
-      - Otherwise tokenize the question and search across filename + key meta fields.
-    """
-    qnorm = question.strip().lower()
-    filters = extract_filters(question)
-    log.info("query_request", question=question, limit=limit, **({k: v for k, v in filters.items()}))
-
-    # 1) If NLP found a place, try partial/case-insensitive DB filtering first
-    clauses = []
-    if "governing_law" in filters:
-        val = filters["governing_law"]
-        clauses.append((Document.governing_law != None))  # noqa: E711
-        clauses.append(func.lower(Document.governing_law).like(f"%{val.lower()}%"))
-    if "geography" in filters:
-        val = filters["geography"]
-        clauses.append((Document.geography != None))  # noqa: E711
-        clauses.append(func.lower(Document.geography).like(f"%{val.lower()}%"))
-
-    if clauses:
-        # Build an OR over the field-specific LIKEs
-        like_clauses = []
-        if len(clauses) >= 2:
-            like_clauses = clauses[1::2]
-        stmt = select(Document).where(or_(*like_clauses)).limit(limit)
-        docs = list(session.exec(stmt))
-        log.debug("query_db_like", path="filters", matches=len(docs))
-        if docs:
-            return [DocHit(document=d.filename, governing_law=d.governing_law) for d in docs]
-
-    # 2) Fallback: keyword search across multiple columns (filename + meta)
+STOPWORDS = {"the","and","for","are","with","under","which","show","docs","doc","law","valid","in","by","of"}
+
+
+def _keywords(qnorm: str) -> List[str]:
     tokens = [t for t in re.findall(r"[a-zA-Z]+", qnorm) if len(t) > 2]
-    stop = {"the","and","for","are","with","under","which","show","docs","doc","law","valid","in","by","of"}
-    tokens = [t for t in tokens if t not in stop]
-    if tokens:
+    return [t for t in tokens if t not in STOPWORDS]
+
+
+class ParsedQuery(NamedTuple):
+    filters: Tuple[Tuple[str, Tuple[str, ...]], ...]  # sorted (column, values): OR within, AND across
+    tokens: Tuple[str, ...]
+
+
+def parse_question(question: str) -> ParsedQuery:
+    """Filters and keywords for a question, memoized on its normalized form."""
+    key = " ".join(question.lower().split())
+    parsed = query_parse_cache.get(key)
+    if parsed is None:
+        parsed = ParsedQuery(tuple(sorted(extract_filters(key).items())), tuple(_keywords(key)))
+        query_parse_cache.put(key, parsed)
+    return parsed
+
+
+def _hits(docs) -> List[DocHit]:
+    return [DocHit(document=d.filename, governing_law=d.governing_law) for d in docs]
+
+
+def _fts_candidates(q: ParsedQuery) -> List[Tuple[str, str]]:
+    """(path, FTS5 match expression) in the order they are tried."""
+    candidates = []
+    if q.filters:
+        # NLP found metadata mentions: all of them must match their columns
+        candidates.append(("filters", " AND ".join(column_any(k, vs) for k, vs in q.filters)))
+    if q.tokens:
+        # keyword search across filename, meta and body
+        candidates.append(("keywords", any_term(q.tokens)))
+    return candidates
+
+
+def _like_candidates(q: ParsedQuery) -> List[Tuple[str, ColumnElement]]:
+    """(path, WHERE clause) for databases without FTS5, in the order they are tried."""
+    candidates = []
+    if q.filters:
+        # case-insensitive CONTAINS (not exact) on each metadata column
+        candidates.append(("filters", and_(*[
+            or_(*[func.lower(getattr(Document, k)).like(f"%{v.lower()}%") for v in vs]) for k, vs in q.filters
+        ])))
+    if q.tokens:
+        # keyword search across filename + meta
         ors = []
-        for t in tokens:
+        for t in q.tokens:
             pat = f"%{t}%"
             ors.extend([
                 func.lower(Document.filename).like(pat),
@@ -76,33 +94,196 @@ def _find_docs(question: str, session: Session, limit: int) -> List[DocHit]:
                 func.lower(Document.agreement_type).like(pat),
                 func.lower(Document.industry).like(pat),
             ])
-        stmt = select(Document).where(or_(*ors)).limit(limit)
-        docs = list(session.exec(stmt))
-        log.debug("query_db_like", path="keywords", tokens=tokens, matches=len(docs))
-        return [DocHit(document=d.filename, governing_law=d.governing_law) for d in docs]
+        candidates.append(("keywords", or_(*ors)))
+    return candidates
+
+
+def _find_docs(q: ParsedQuery, session: Session, limit: int) -> List[DocHit]:
+    """
+    Ranked full-text matching:
+      - If NLP extracted metadata filters -> one query requiring all of them
+        (any listed value per column).
+      - Otherwise (or if that finds nothing) tokenize the question and match
+        filename, metadata and contract body.
+    Falls back to LIKE scans on databases without FTS5.
+    """
+    if fts_available(session):
+        for path, match in _fts_candidates(q):
+            docs = fetch_ranked(session, search_ids(session, match, limit))
+            log.debug("query_db_fts", path=path, tokens=q.tokens, matches=len(docs))
+            if docs or path == "keywords":
+                return _hits(docs)
+    else:
+        for path, clause in _like_candidates(q):
+            docs = list(session.exec(select(Document).where(clause).limit(limit)))
+            log.debug("query_db_like", path=path, tokens=q.tokens, matches=len(docs))
+            if docs or path == "keywords":
+                return _hits(docs)
 
-    # 3) Nothing useful in the question -> return empty
+    # Nothing useful in the question -> return empty
     log.debug("query_no_tokens")
     return []
 
 
+# --- recency order: keyset pages and NDJSON export ---
+
+# Ids grow with insertion, so "newest first" is descending id, which is the
+# order the FTS index already keeps its rowids in (and the primary key's).
+Cursor = int  # id of the last row already returned
+STREAM_BATCH = 500
+Matcher = Tuple[str, object]  # ("fts", match expression) or ("like", WHERE clause)
+
+
+def _encode_cursor(doc_id: int) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps([doc_id])).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Cursor:
+    try:
+        (doc_id,) = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(doc_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _matcher(session: Session, q: ParsedQuery) -> Optional[Matcher]:
+    """The predicate _find_docs would answer with, unranked."""
+    if fts_available(session):
+        for path, match in _fts_candidates(q):
+            if path == "keywords" or has_match(session, match):
+                return "fts", match
+    else:
+        for path, clause in _like_candidates(q):
+            if path == "keywords" or session.exec(select(Document.id).where(clause).limit(1)).first() is not None:
+                return "like", clause
+    return None
+
+
+def _recent_ids(session: Session, m: Matcher, limit: int, after: Optional[Cursor]) -> List[int]:
+    """Up to `limit` matching ids below `after`, newest first; reads O(limit) index entries."""
+    kind, predicate = m
+    if kind == "fts":
+        return recent_ids(session, predicate, limit, before=after)
+    stmt = select(Document.id).where(predicate).order_by(Document.id.desc()).limit(limit)
+    if after is not None:
+        stmt = stmt.where(Document.id < after)
+    return list(session.exec(stmt))
+
+
+def _rows(session: Session, ids: List[int]):
+    """Narrow rows for `ids`, in that order."""
+    if not ids:
+        return []
+    by_id = {r.id: r for r in session.exec(
+        select(Document.id, Document.filename, Document.governing_law).where(Document.id.in_(ids))
+    )}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def _find_page(q: ParsedQuery, session: Session, limit: int, after: Optional[Cursor]) -> Tuple[List[DocHit], Optional[str]]:
+    """One page of matches, newest first, plus the cursor for the next page (None at the end)."""
+    m = _matcher(session, q)
+    if m is None:
+        return [], None
+    ids = _recent_ids(session, m, limit + 1, after)
+    next_cursor = _encode_cursor(ids[limit - 1]) if len(ids) > limit else None
+    return _hits(_rows(session, ids[:limit])), next_cursor
+
+
+def _next_batch(session: Session, m: Matcher, after: Optional[Cursor]) -> Tuple[list, Optional[Cursor]]:
+    ids = _recent_ids(session, m, STREAM_BATCH, after)
+    return _rows(session, ids), (ids[-1] if len(ids) == STREAM_BATCH else None)
+
+
+async def _stream_hits(q: ParsedQuery, after: Optional[Cursor]) -> AsyncIterator[bytes]:
+    # The request-scoped session is closed before a streamed body is sent,
+    # so the export opens its own. Rows are read STREAM_BATCH at a time,
+    # each batch a keyset page like the JSON ones.
+    count = 0
+    async with AsyncSession(async_engine) as session:
+        m = await session.run_sync(_matcher, q)
+        while m is not None:
+            rows, after = await session.run_sync(_next_batch, m, after)
+            count += len(rows)
+            if rows:
+                yield b"".join(
+                    orjson.dumps({"document": r.filename, "governing_law": r.governing_law}) + b"\n" for r in rows
+                )
+            if after is None:
+                break
+    log.info("query_stream_complete", count=count)
+
+
+async def _query(
+    question: str,
+    request: Request,
+    response: Response,
+    session: AsyncSession,
+    limit: int,
+    order: str,
+    cursor: Optional[str],
+    fmt: str,
+):
+    after = _decode_cursor(cursor) if cursor else None
+    q = parse_question(question)
+    log.info("query_request", question=question, limit=limit, order=order, format=fmt,
+             **{k: list(vs) for k, vs in q.filters})
+    if fmt == "ndjson":
+        return StreamingResponse(_stream_hits(q, after), media_type="application/x-ndjson")
+    if after is not None:
+        order = "recent"
+
+    # keyed on the parse, so rephrasings of the same question share an entry
+    key = (q, limit, order, cursor)
+    etag = make_etag(await session.run_sync(corpus_version), "query", key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        log.info("query_not_modified")
+        return Response(status_code=304, headers=headers)
+
+    cached = query_result_cache.get(etag)
+    if cached is None:
+        if order == "recent":
+            cached = await session.run_sync(lambda s: _find_page(q, s, limit, after))
+        else:
+            cached = (await session.run_sync(lambda s: _find_docs(q, s, limit)), None)
+        query_result_cache.put(etag, cached)
+    docs, next_cursor = cached
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    response.headers.update(headers)
+    log.info("query_response", count=len(docs), more=bool(next_cursor))
+    return docs
+
+
+ORDER_DESCRIPTION = "relevance: best matches first (limit caps the result); recent: newest first, paged via X-Next-Cursor"
+CURSOR_DESCRIPTION = "X-Next-Cursor from the previous page (implies order=recent)"
+FORMAT_DESCRIPTION = "ndjson streams every match, newest first, one JSON object per line (limit is ignored)"
+
+
 @router.post("/query/documents", response_model=List[DocHit])
-def query_documents_post(
+async def query_documents_post(
     q: QueryIn,
-    session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session),
     limit: int = Query(50, ge=1, le=200),
+    order: Literal["relevance", "recent"] = Query("relevance", description=ORDER_DESCRIPTION),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    format: Literal["json", "ndjson"] = Query("json", description=FORMAT_DESCRIPTION),
 ) -> List[DocHit]:
-    docs = _find_docs(q.question, session, limit)
-    log.info("query_response", count=len(docs))
-    return docs
+    return await _query(q.question, request, response, session, limit, order, cursor, format)
 
 
 @router.get("/query/documents", response_model=List[DocHit])
-def query_documents_get(
+async def query_documents_get(
+    request: Request,
+    response: Response,
     question: str = Query(..., description="Natural language question"),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     limit: int = Query(50, ge=1, le=200),
+    order: Literal["relevance", "recent"] = Query("relevance", description=ORDER_DESCRIPTION),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    format: Literal["json", "ndjson"] = Query("json", description=FORMAT_DESCRIPTION),
 ) -> List[DocHit]:
-    docs = _find_docs(question, session, limit)
-    log.info("query_response", count=len(docs))
-    return docs
+    return await _query(question, request, response, session, limit, order, cursor, format)
@@ -1,71 +1,68 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from uuid import uuid4
 from pathlib import Path
+import hashlib
 import os
 
-from fastapi import APIRouter, BackgroundTasks, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from app.core.logging import log
+from app.core.metrics import UPLOAD_BYTES, UPLOAD_WRITE_SECONDS
 
-from ..db import get_session
-from ..models.document import Document
-from ..services.text_utils import extract_text_from_file
-from ..services.extraction import extract_metadata
+from ..db import get_async_session
+from ..services.ingestion import enqueue_job, get_ingest_queue, job_status
 
 router = APIRouter()
 
-UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "./uploads"))
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "./uploads"))  # created by the first upload
 MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "20"))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
 
 
-def _process_saved_files(saved: List[Dict[str, Any]]) -> None:
-    """Runs in background: extract text, derive metadata, store in DB (sync)."""
-    log.info("upload_bg_start", files=len(saved))
-    session = get_session()
-    try:
-        for s in saved:
-            log.debug("upload_bg_process_file", filename=s.get("original_name"), path=str(s.get("path")))
-            text = extract_text_from_file(str(s["path"]), s["content_type"] or "application/octet-stream")
-            md = extract_metadata(text)  # agreement_type / governing_law / geography / industry
+async def _stream_to_disk(f: UploadFile, dest: Path, max_bytes: int) -> Tuple[Optional[int], str]:
+    """Copy an upload to `dest` one chunk at a time, hashing as it goes.
 
-            doc = Document(
-                filename=s["original_name"],
-                content_type=s["content_type"],
-                size_bytes=s["size_bytes"],
-                text=text,
-                agreement_type=md.get("agreement_type"),
-                governing_law=md.get("governing_law"),
-                geography=md.get("geography"),
-                industry=md.get("industry"),
-            )
-            session.add(doc)
-        session.commit()
-        log.info("upload_bg_committed", files=len(saved))
-    finally:
-        session.close()
-        log.info("upload_bg_end")
+    Returns (size, sha256 hex); size is None if the file exceeded `max_bytes`
+    (the partial file is removed).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(dest, "wb") as out:
+        while chunk := await f.read(UPLOAD_CHUNK_BYTES):
+            size += len(chunk)
+            if size > max_bytes:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+    if size > max_bytes:
+        dest.unlink(missing_ok=True)
+        return None, ""
+    return size, digest.hexdigest()
 
 
 @router.post("/upload")
-async def upload(background_tasks: BackgroundTasks, files: List[UploadFile] = File(...)):
+async def upload(files: List[UploadFile] = File(...)):
     log.info("upload_request", files=len(files) if files else 0)
     if not files:
         log.warn("upload_no_files")
         raise HTTPException(status_code=400, detail="No files provided.")
 
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
     saved: List[Dict[str, Any]] = []
     for f in files:
         log.debug("upload_file_begin", filename=getattr(f, "filename", None), content_type=getattr(f, "content_type", None))
-        content = await f.read()
-        size = len(content)
-        if size > MAX_UPLOAD_MB * 1024 * 1024:
-            log.warn("upload_file_too_large", filename=f.filename, size=size, max_mb=MAX_UPLOAD_MB)
-            raise HTTPException(status_code=413, detail=f"{f.filename} exceeds {MAX_UPLOAD_MB}MB limit")
-
         ext = Path(f.filename).suffix or ""
         dest = UPLOAD_DIR / f"{uuid4().hex}{ext}"
-        with open(dest, "wb") as out:
-            out.write(content)
+        with UPLOAD_WRITE_SECONDS.time():
+            size, sha256 = await _stream_to_disk(f, dest, MAX_UPLOAD_MB * 1024 * 1024)
+        if size is None:
+            log.warn("upload_file_too_large", filename=f.filename, max_mb=MAX_UPLOAD_MB)
+            for s in saved:  # the whole request is rejected
+                s["path"].unlink(missing_ok=True)
+            raise HTTPException(status_code=413, detail=f"{f.filename} exceeds {MAX_UPLOAD_MB}MB limit")
+        UPLOAD_BYTES.inc(size)
         log.debug("upload_file_saved", filename=f.filename, path=str(dest), bytes=size)
 
         saved.append({
@@ -73,8 +70,32 @@ async def upload(background_tasks: BackgroundTasks, files: List[UploadFile] = Fi
             "original_name": f.filename,
             "content_type": f.content_type or "application/octet-stream",
             "size_bytes": size,
+            "sha256": sha256,
         })
 
-    background_tasks.add_task(_process_saved_files, saved)
-    log.info("upload_accepted", count=len(saved))
-    return {"status": "accepted", "count": len(saved), "message": "Files accepted for background processing."}
+    try:
+        job_id = await run_in_threadpool(enqueue_job, saved)
+    except (PoolTimeoutError, OperationalError) as e:
+        # the writer connection stayed busy (ingestion) or another process held the file lock
+        if isinstance(e, OperationalError) and "locked" not in str(e):
+            raise
+        log.warn("upload_writer_busy", files=len(saved), error=str(e))
+        for s in saved:
+            s["path"].unlink(missing_ok=True)
+        raise HTTPException(status_code=503, detail="Ingestion is busy; retry shortly.", headers={"Retry-After": "5"})
+    get_ingest_queue().notify()
+    log.info("upload_accepted", count=len(saved), job_id=job_id)
+    return {
+        "status": "accepted",
+        "count": len(saved),
+        "job_id": job_id,
+        "message": "Files accepted for background processing.",
+    }
+
+
+@router.get("/upload/jobs/{job_id}")
+async def upload_job(job_id: int, session: AsyncSession = Depends(get_async_session)):
+    status = await session.run_sync(job_status, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
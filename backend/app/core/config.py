@@ -10,16 +10,57 @@ class Settings(BaseSettings):
     DEBUG: bool = False
 
     DATABASE_URL: str = Field(default="sqlite+aiosqlite:///./app.db")
+    DB_READ_POOL_SIZE: int = Field(default=8, description="Read-only connections per engine (SQLite profile)")
+    SQLITE_WAL: bool = Field(default=True, description="WAL journal: readers are not blocked by the writer")
+    SQLITE_SYNCHRONOUS: str = Field(default="NORMAL", description="OFF|NORMAL|FULL; NORMAL is durable per checkpoint under WAL")
+    SQLITE_CACHE_SIZE_MB: int = Field(default=64, description="Page cache per connection")
+    SQLITE_MMAP_SIZE_MB: int = Field(default=256, description="Memory-mapped I/O window per connection; 0 disables")
+    DB_WRITE_POOL_TIMEOUT_S: float = Field(default=10.0, description="SQLite profile: max wait for the shared writer connection; uploads then answer 503")
+    SQLITE_BUSY_TIMEOUT_MS: int = Field(default=5000, description="Wait this long for a lock held by another process")
     DATA_DIR: str = Field(default="./data")
     STORAGE_BACKEND: str = Field(default="local")
+    RETRIEVAL_INDEX_FILE: str = Field(default="retrieval_index.npz", description="QA retrieval index, relative to DATA_DIR")
+    RETRIEVAL_INDEX_BITS: int = Field(default=18, description="log2 of the hashed vocabulary size")
 
     CORS_ORIGINS: List[str] = Field(default_factory=lambda: ["http://localhost:5173"])
 
     MAX_UPLOAD_MB: int = 20
     REQUEST_TIMEOUT_S: int = 25
-    RATE_LIMIT_WINDOW_S: int = Field(default=60, description="Sliding window in seconds")
-    RATE_LIMIT_MAX_REQUESTS: int = Field(default=120, description="Max requests per window per IP")
+    INGEST_CONCURRENCY: int = Field(default=2, description="Ingestion jobs processed at once per API process")
+    INGEST_BATCH_SIZE: int = Field(default=100, description="Files parsed and committed per write transaction")
+    INGEST_MAX_ATTEMPTS: int = Field(default=3, description="Tries per job/file before it is marked failed")
+    INGEST_RETRY_BACKOFF_S: float = Field(default=2.0, description="First retry delay; doubles per attempt")
+    INGEST_RETRY_BACKOFF_MAX_S: float = Field(default=300.0)
+    INGEST_LEASE_S: int = Field(default=60, description="A running job not renewed for this long is reclaimed")
+    INGEST_POLL_INTERVAL_S: float = Field(default=1.0, description="Idle workers check for new jobs this often")
+    EXTRACT_WORKERS: int = Field(default_factory=lambda: min(4, os.cpu_count() or 1), description="PDF/DOCX extraction processes; 0 parses inline")
+    EXTRACT_TIMEOUT_S: int = Field(default=120, description="Wall-clock limit for extracting one file")
+    EXTRACT_MAX_TASKS_PER_CHILD: int = Field(default=50, description="Recycle extraction processes after N files; 0 never")
+    PDF_EXTRACT_MODE: str = Field(default="full", description="full: parse the whole PDF | streaming: page by page, within the budgets below")
+    PDF_MAX_PAGES: int = Field(default=50, description="Streaming: pages read for classification; 0 unlimited")
+    PDF_MAX_CHARS: int = Field(default=500_000, description="Streaming: characters read for classification; 0 unlimited")
+    PDF_MAX_SECONDS: float = Field(default=20.0, description="Streaming: wall-clock budget per PDF; 0 unlimited")
+    PDF_EARLY_EXIT: bool = Field(default=True, description="Streaming: stop once every metadata field has a match")
+    PDF_DEFERRED_FULL_TEXT: bool = Field(default=True, description="Streaming: after the job, store the full text of PDFs read only in part")
+    PDF_FULL_TEXT_WORKERS: int = Field(default=1, description="Deferred pass: its own low-priority extraction processes, apart from EXTRACT_WORKERS; 0 parses inline")
+    PDF_FULL_TEXT_TIMEOUT_S: int = Field(default=900, description="Deferred pass: wall-clock limit for parsing one whole PDF")
+    RATE_LIMIT_WINDOW_S: int = Field(default=60, description="Window in seconds; tokens refill at MAX_REQUESTS per window")
+    RATE_LIMIT_MAX_REQUESTS: int = Field(default=120, description="Max requests per window per IP (also the burst size)")
+    RATE_LIMIT_BACKEND: str = Field(default="memory", description="memory (per process) | sqlite (shared by workers on one host)")
+    RATE_LIMIT_SQLITE_PATH: Optional[str] = Field(default=None, description="Bucket file for the sqlite backend; default DATA_DIR/ratelimit.db")
+    RATE_LIMIT_SQLITE_BUSY_TIMEOUT_MS: int = Field(default=5, description="sqlite backend: max wait for another worker's lock (blocks the event loop) before allowing the request")
+    RATE_LIMIT_MAX_KEYS: int = Field(default=100_000, description="Max tracked clients per process (memory backend)")
+    RESPONSE_CACHE_SIZE: int = Field(default=256, description="Max cached dashboard responses (LRU); 0 disables")
+    QUERY_PARSE_CACHE_SIZE: int = Field(default=1024, description="Max memoized question parses (LRU); 0 disables")
+    QUERY_RESULT_CACHE_SIZE: int = Field(default=512, description="Max cached query hit lists (LRU); 0 disables")
+    LOG_LEVEL: str = Field(default="INFO")
+    LOG_MODE: str = Field(default="sync", description="sync: write each event to stdout | queued: bounded queue drained by a writer thread (production)")
+    LOG_QUEUE_SIZE: int = Field(default=10_000, description="Max events waiting for the writer (queued mode)")
+    LOG_QUEUE_POLICY: str = Field(default="drop", description="When the queue is full: drop (counted and reported) | block (caller waits)")
+    LOG_DEBUG_SAMPLE_RATE: float = Field(default=1.0, description="Fraction of debug events kept; info and above are never sampled")
     SHUTDOWN_GRACE_PERIOD_S: int = Field(default=10, description="Max seconds to wait for in-flight requests to finish on shutdown")
+    SHUTDOWN_DRAIN_DELAY_S: float = Field(default=0.0, description="Multi-worker: seconds /readyz reports draining before workers stop accepting")
+    MULTIPROC_DIR: Optional[str] = Field(default=None, description="Multi-worker: in-flight counters and the drain marker, shared by workers; set by gunicorn_conf.py")
 
     class Config:
         env_file = ".env"
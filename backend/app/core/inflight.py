@@ -0,0 +1,86 @@
+"""
+In-flight request accounting, shared by the worker processes of one server.
+
+Each process counts its own requests. With MULTIPROC_DIR set (gunicorn_conf.py
+does), every worker also publishes its count in an 8-byte memory-mapped slot
+file there, so any worker can answer for all of them: /readyz reports the total
+and the shutdown log says what other workers still had running. A `draining`
+marker in the same directory, written by the gunicorn master when it begins to
+stop, turns /readyz to 503 in every worker at once; a single worker being
+recycled only marks itself.
+"""
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+
+_SLOT = struct.Struct("q")
+_SLOT_PREFIX = "inflight_"
+DRAIN_MARKER = "draining"
+
+
+class InFlight:
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self.directory = Path(directory) if directory else None
+        self.count = 0  # this process
+        self._draining = False
+        self._pid: Optional[int] = None
+        self._slot: Optional[mmap.mmap] = None
+
+    def _publish(self) -> None:
+        if self._pid != os.getpid():  # first request, or a fork of a process that had a slot
+            self._pid = os.getpid()
+            with open(self.directory / f"{_SLOT_PREFIX}{self._pid}", "wb+") as f:
+                f.write(bytes(_SLOT.size))
+                f.flush()
+                self._slot = mmap.mmap(f.fileno(), _SLOT.size)
+        _SLOT.pack_into(self._slot, 0, self.count)
+
+    def enter(self) -> None:
+        self.count += 1
+        if self.directory is not None:
+            self._publish()
+
+    def exit(self) -> None:
+        self.count = max(0, self.count - 1)
+        if self.directory is not None:
+            self._publish()
+
+    def total(self) -> int:
+        """Requests in flight across every worker sharing the directory."""
+        if self.directory is None:
+            return self.count
+        total = 0
+        for path in self.directory.glob(f"{_SLOT_PREFIX}*"):
+            try:
+                total += _SLOT.unpack(path.read_bytes()[:_SLOT.size])[0]
+            except (OSError, struct.error):  # removed or still being created meanwhile
+                pass
+        return total
+
+    @property
+    def draining(self) -> bool:
+        return self._draining or (self.directory is not None and (self.directory / DRAIN_MARKER).exists())
+
+    def begin_drain(self) -> None:
+        """This process is shutting down: it is no longer ready."""
+        self._draining = True
+
+
+in_flight = InFlight(settings.MULTIPROC_DIR)
+
+
+def begin_server_drain(directory: str) -> None:
+    """Mark every worker sharing `directory` as draining (called by the gunicorn master)."""
+    (Path(directory) / DRAIN_MARKER).touch()
+
+
+def forget_worker(directory: str, pid: int) -> None:
+    """Drop the slot of a worker that exited, however it exited."""
+    try:
+        (Path(directory) / f"{_SLOT_PREFIX}{pid}").unlink()
+    except FileNotFoundError:
+        pass
@@ -1,28 +1,208 @@
 # backend/app/core/logging.py
+"""
+Structured JSON logging (structlog, rendered with orjson).
+
+LOG_MODE=sync writes every event to stdout from the calling thread; fine in
+development. LOG_MODE=queued (production) renders the event in the caller
+and hands the line to a bounded queue that one writer thread drains in
+batches, so a slow stdout (a pipe to a busy log shipper) does not add
+latency to requests. When the queue is full, LOG_QUEUE_POLICY decides:
+
+  - drop:  the event is discarded and counted; the writer reports the count
+           as a `log_events_dropped` event. Requests never wait on logging.
+  - block: the caller waits for space. Nothing is lost, but a stalled
+           stdout eventually stalls requests.
+
+Debug events can be sampled (LOG_DEBUG_SAMPLE_RATE) to keep per-file and
+per-request debug output affordable; info and above are always kept.
+"""
+import atexit
 import logging, sys, contextvars
+import os
+import queue
+import random
+import threading
+import time
+from typing import BinaryIO, List, Optional
+
+import orjson
 import structlog
-from typing import Optional   # <-- add this
+
+from app.core.config import settings
 
 _request_id_ctx = contextvars.ContextVar("request_id", default=None)
 
 def get_request_id() -> Optional[str]:
     return _request_id_ctx.get()
 
-def set_request_id(val: Optional[str]) -> None:   # <-- just Optional[str]
+def set_request_id(val: Optional[str]) -> None:
     _request_id_ctx.set(val)
 
-def configure_logging():
+
+class QueuedLogSink:
+    """Bounded queue of rendered lines, written to `stream` by a daemon thread."""
+
+    def __init__(self, stream: BinaryIO, maxsize: int = 10_000, policy: str = "drop", batch: int = 256) -> None:
+        if policy not in ("drop", "block"):
+            raise ValueError(f"unknown log queue policy: {policy}")
+        self.stream = stream
+        self.maxsize = maxsize
+        self.policy = policy
+        self.batch = batch
+        self.dropped = 0  # events discarded since the last report
+        self._lock = threading.Lock()
+        self._start()
+
+    def _start(self) -> None:
+        self._closed = False
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue(self.maxsize)
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, line: bytes) -> None:
+        if self._closed:  # late events at exit: write them directly
+            self.stream.write(line)
+            self.stream.flush()
+            return
+        if self.policy == "block":
+            self._queue.put(line)
+            return
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _take_dropped(self) -> int:
+        with self._lock:
+            dropped, self.dropped = self.dropped, 0
+        return dropped
+
+    def _run(self) -> None:
+        q = self._queue
+        while True:
+            item = q.get()
+            lines: List[bytes] = []
+            while item is not None:
+                lines.append(item)
+                if len(lines) >= self.batch:
+                    break
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    break
+            dropped = self._take_dropped()
+            if dropped:
+                lines.append(orjson.dumps({
+                    "event": "log_events_dropped", "count": dropped, "level": "warning",
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()),
+                }) + b"\n")
+            try:
+                self.stream.write(b"".join(lines))
+                self.stream.flush()
+            except (OSError, ValueError):
+                pass  # stdout closed or broken: nothing useful left to do with the lines
+            if item is None:
+                return
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Write out what is queued, then stop the writer."""
+        if self._thread.is_alive() and not self._closed:
+            self._closed = True
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            self._thread.join(timeout)
+
+    def after_fork(self) -> None:
+        # the writer thread does not survive fork(); a child gets a fresh queue and thread
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._start()
+
+
+class _QueueLogger:
+    """structlog logger that hands rendered lines to a QueuedLogSink."""
+
+    def __init__(self, sink: QueuedLogSink) -> None:
+        self._sink = sink
+
+    def msg(self, message: bytes) -> None:
+        self._sink.write(message + b"\n")
+
+    log = debug = info = warn = warning = msg
+    fatal = failure = err = error = critical = exception = msg
+
+
+def sample_debug(rate: float):
+    """Processor keeping a `rate` fraction of debug events."""
+    def processor(logger, method_name, event_dict):
+        if method_name == "debug" and random.random() >= rate:
+            raise structlog.DropEvent
+        return event_dict
+    return processor
+
+
+_sink: Optional[QueuedLogSink] = None
+
+
+def configure_logging(
+    mode: Optional[str] = None,
+    level: Optional[str] = None,
+    stream: Optional[BinaryIO] = None,
+) -> None:
+    global _sink
+    mode = mode or settings.LOG_MODE
+    processors = []
+    if settings.LOG_DEBUG_SAMPLE_RATE < 1.0:
+        processors.append(sample_debug(settings.LOG_DEBUG_SAMPLE_RATE))
+    processors += [
+        structlog.contextvars.merge_contextvars,
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.processors.add_log_level,
+        structlog.processors.JSONRenderer(serializer=orjson.dumps),
+    ]
+    stream = stream or sys.stdout.buffer
+    shutdown_logging()
+    if mode == "queued":
+        _sink = QueuedLogSink(stream, settings.LOG_QUEUE_SIZE, settings.LOG_QUEUE_POLICY)
+        logger_factory = lambda *args: _QueueLogger(_sink)
+    else:
+        logger_factory = structlog.BytesLoggerFactory(file=stream)
     structlog.configure(
-        processors=[
-            structlog.contextvars.merge_contextvars,
-            structlog.processors.TimeStamper(fmt="iso"),
-            structlog.processors.add_log_level,
-            structlog.processors.JSONRenderer(),
-        ],
-        wrapper_class=structlog.make_filtering_bound_logger(logging.INFO),
-        logger_factory=structlog.PrintLoggerFactory(file=sys.stdout),
+        processors=processors,
+        wrapper_class=structlog.make_filtering_bound_logger(_level_number(level or settings.LOG_LEVEL)),
+        logger_factory=logger_factory,
         cache_logger_on_first_use=True,
     )
 
+
+_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+
+def _level_number(name: str) -> int:
+    level = logging.getLevelName(name.upper())  # an unknown name comes back as the string "Level <name>"
+    if not isinstance(level, int) or level not in (logging.NOTSET, *map(logging.getLevelName, _LEVELS)):
+        raise ValueError(f"unknown log level {name!r} (LOG_LEVEL): use one of {', '.join(_LEVELS)}")
+    return level
+
+
+def shutdown_logging(timeout: float = 2.0) -> None:
+    """Flush and stop the queued writer, if any (called on shutdown and at exit)."""
+    global _sink
+    if _sink is not None:
+        _sink.close(timeout)
+        _sink = None
+
+
+def _after_fork_in_child() -> None:
+    if _sink is not None:
+        _sink.after_fork()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+atexit.register(shutdown_logging)
+
 configure_logging()
 log = structlog.get_logger()
@@ -0,0 +1,54 @@
+"""
+Prometheus metrics, defined in one place so every module shares them.
+
+HTTP metrics are labelled by route template (e.g. /api/v1/upload/jobs/{job_id}),
+never by raw path, to keep label cardinality bounded.
+
+Under gunicorn, PROMETHEUS_MULTIPROC_DIR is set before this module is first
+imported: every worker then writes its samples to files there and render()
+aggregates them, so /metrics reports the whole server whichever worker answers.
+Gauges declare how their per-worker values combine.
+"""
+import os
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+# requests that never reached a route (404s, or rejected at the edge)
+UNROUTED = "<unrouted>"
+
+REQUESTS = Counter("http_requests_total", "Total HTTP requests", ["method", "path", "status"])
+LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ["path"])
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled", multiprocess_mode="livesum")
+
+CACHE_LOOKUPS = Counter("cache_lookups_total", "In-process cache lookups", ["cache", "result"])
+
+# --- ingestion, by stage ---
+_FAST = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+_SLOW = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+UPLOAD_BYTES = Counter("ingest_upload_bytes_total", "Bytes received and written to the upload directory")
+UPLOAD_WRITE_SECONDS = Histogram("ingest_upload_write_seconds", "Streaming one uploaded file to disk", buckets=_FAST)
+EXTRACT_TEXT_SECONDS = Histogram(
+    "ingest_extract_text_seconds", "Text extraction per file", ["kind"], buckets=_SLOW,
+)
+EXTRACT_METADATA_SECONDS = Histogram(
+    "ingest_extract_metadata_seconds", "Metadata classification per document", buckets=_FAST,
+)
+DB_COMMIT_SECONDS = Histogram(
+    "ingest_db_commit_seconds", "Writing and committing one chunk of documents", buckets=_FAST,
+)
+# read from the database by every worker: the latest reading is the answer
+QUEUE_DEPTH = Gauge(
+    "ingest_queue_depth", "Work waiting in the ingestion queue", ["unit"], multiprocess_mode="livemostrecent",
+)
+DOCUMENTS = Counter("ingest_documents_total", "Documents stored; rate() gives documents per second")
+FILES = Counter("ingest_files_total", "Ingested files by outcome", ["outcome"])
+
+
+def render() -> bytes:
+    """Exposition text for /metrics: this process, or every worker in multiprocess mode."""
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return generate_latest()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
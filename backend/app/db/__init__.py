@@ -1,5 +1,5 @@
-from .engine import engine
-from .session import get_session
-from .init_db import init_db
+from .engine import async_engine, engine, read_engine
+from .session import get_async_session, get_read_session, get_session
+from .init_db import INIT_DB_DONE_ENV, init_db
 
-__all__ = ["engine", "get_session", "init_db"]
+__all__ = ["async_engine", "engine", "read_engine", "get_async_session", "get_read_session", "get_session", "init_db", "INIT_DB_DONE_ENV"]
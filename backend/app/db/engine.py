@@ -1,5 +1,99 @@
-import os
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import create_engine
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
-engine = create_engine(DATABASE_URL, echo=False, future=True)
+from app.core.config import settings
+
+# async driver per backend; the sync engine uses the backend's default driver
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def _sync_url(url: str) -> str:
+    u = make_url(url)
+    if u.get_driver_name() in ASYNC_DRIVERS.values():
+        u = u.set(drivername=u.get_backend_name())
+    return u.render_as_string(hide_password=False)
+
+
+def _async_url(url: str) -> str:
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if u.get_driver_name() not in ASYNC_DRIVERS.values() and backend in ASYNC_DRIVERS:
+        u = u.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    return u.render_as_string(hide_password=False)
+
+
+def _is_sqlite_file(url: str) -> bool:
+    u = make_url(url)
+    return u.get_backend_name() == "sqlite" and u.database not in (None, "", ":memory:")
+
+
+def sqlite_pragmas(read_only: bool) -> list:
+    """Per-connection pragmas for the SQLite profile (journal mode is set by the writer)."""
+    pragmas = [
+        f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA cache_size = -{settings.SQLITE_CACHE_SIZE_MB * 1024}",  # negative = KiB
+        f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE_MB * 1024 * 1024}",
+        "PRAGMA foreign_keys = ON",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    elif settings.SQLITE_WAL:
+        pragmas.insert(0, "PRAGMA journal_mode = WAL")
+    return pragmas
+
+
+def _apply_pragmas(sync_engine: Engine, read_only: bool) -> None:
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_conn, _record) -> None:
+        cur = dbapi_conn.cursor()
+        for p in pragmas:
+            cur.execute(p)
+        cur.close()
+
+
+DATABASE_URL = _sync_url(settings.DATABASE_URL)
+ASYNC_DATABASE_URL = _async_url(settings.DATABASE_URL)
+
+if _is_sqlite_file(DATABASE_URL):
+    # SQLite allows one writer at a time. Writes (ingestion, migrations) share
+    # a single connection so they queue in-process instead of on file locks;
+    # WAL lets the read pools keep serving from the last commit meanwhile.
+    # Uploads (enqueue_job) share this connection with the ingestion workers
+    # (job polling, lease renewals, chunk writes, index syncs): a caller waits
+    # up to DB_WRITE_POOL_TIMEOUT_S for it, then gets sqlalchemy's TimeoutError.
+    engine = create_engine(
+        DATABASE_URL, echo=False, future=True, poolclass=QueuePool, pool_size=1, max_overflow=0,
+        pool_timeout=settings.DB_WRITE_POOL_TIMEOUT_S,
+    )
+    read_engine = create_engine(
+        DATABASE_URL, echo=False, future=True, poolclass=QueuePool, pool_size=settings.DB_READ_POOL_SIZE, max_overflow=0,
+    )
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, echo=False, poolclass=AsyncAdaptedQueuePool, pool_size=settings.DB_READ_POOL_SIZE, max_overflow=0,
+    )
+    _apply_pragmas(engine, read_only=False)
+    _apply_pragmas(read_engine, read_only=True)
+    _apply_pragmas(async_engine.sync_engine, read_only=True)
+else:
+    # sync engine: ingestion workers, migrations, scripts
+    engine = create_engine(DATABASE_URL, echo=False, future=True)
+    read_engine = engine
+    # async engine: read endpoints, awaited on the event loop
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False)
+
+
+def after_fork() -> None:
+    """Forget pooled connections inherited from a parent (gunicorn --preload).
+
+    They belong to the parent: close=False drops them without closing its sockets
+    or file handles, and the child opens its own on first use.
+    """
+    engine.dispose(close=False)
+    read_engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
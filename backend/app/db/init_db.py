@@ -1,5 +1,74 @@
-from sqlmodel import SQLModel
+from sqlite3 import sqlite_version_info
+
+from sqlalchemy import inspect, text
+from sqlmodel import SQLModel, Session, select
 from .engine import engine
+from app.core.logging import log
+from app.models.document import Document
+from app.models.facet import FacetCount
+from app.models.corpus import CorpusVersion  # noqa: F401  (registers the table)
+from app.models.job import IngestJob  # noqa: F401
+
+# Set by a process that ran init_db() before forking its workers (gunicorn_conf.py
+# with preload): the workers inherit it and skip their own run.
+INIT_DB_DONE_ENV = "APP_INIT_DB_DONE"
+
+
+def _add_missing_columns() -> None:
+    """Additive-forward migration: create nullable columns (and their indexes)
+    that were added to a model after its table was first created."""
+    with engine.begin() as conn:
+        insp = inspect(conn)
+        for table in SQLModel.metadata.sorted_tables:
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            missing = [c for c in table.columns if c.name not in existing]
+            for col in missing:
+                ddl = col.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{col.name}" {ddl}'))
+            if missing:
+                for idx in table.indexes:
+                    idx.create(conn, checkfirst=True)
+
+
+def _move_inline_bodies() -> None:
+    """Move `document.text` (inline bodies, older schema) into compressed
+    `document_body` rows, then drop the column and reclaim the space."""
+    if "text" not in {c["name"] for c in inspect(engine).get_columns("document")}:
+        return
+    from app.services.bodies import store_bodies
+
+    moved, last_id = 0, 0
+    with Session(engine) as session:
+        while True:
+            rows = session.exec(text(
+                "SELECT id, text FROM document WHERE id > :last AND text IS NOT NULL "
+                "AND id NOT IN (SELECT document_id FROM document_body) ORDER BY id LIMIT 500"
+            ).bindparams(last=last_id)).all()
+            if not rows:
+                break
+            store_bodies(session, {doc_id: body for doc_id, body in rows})
+            moved += len(rows)
+            last_id = rows[-1][0]
+        if engine.dialect.name != "sqlite" or sqlite_version_info >= (3, 35):
+            session.exec(text("ALTER TABLE document DROP COLUMN text"))
+        else:
+            session.exec(text("UPDATE document SET text = NULL"))
+        session.commit()
+    if engine.dialect.name == "sqlite":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+    log.info("document_bodies_migrated", moved=moved)
+
 
 def init_db() -> None:
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
+    _move_inline_bodies()
+    with Session(engine) as session:
+        # Backfill the counts table for databases that predate it.
+        if session.exec(select(FacetCount).limit(1)).first() is None \
+                and session.exec(select(Document.id).limit(1)).first() is not None:
+            from app.services.dashboard import rebuild_facet_counts
+            rebuild_facet_counts(session)
+        from app.services.search import ensure_fts
+        ensure_fts(session)
@@ -1,5 +1,23 @@
+from typing import AsyncIterator
+
 from sqlmodel import Session
-from .engine import engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from .engine import async_engine, engine, read_engine
 
 def get_session() -> Session:
-    return Session(engine)
\ No newline at end of file
+    return Session(engine)
+
+
+def get_read_session() -> Session:
+    """Session on the read-only pool; use for sync code paths that never write."""
+    return Session(read_engine)
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """Request-scoped async session (FastAPI dependency).
+
+    Sync helpers that take a Session can run on it unchanged via
+    ``await session.run_sync(fn, *args)``.
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
@@ -1,114 +1,149 @@
 from app.core.config import settings
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, PlainTextResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from app.core.logging import log, set_request_id
-from app.db import init_db
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.logging import log, set_request_id, shutdown_logging
+from app.db import INIT_DB_DONE_ENV, async_engine, init_db
 from app.api import router as api_router
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-import time, uuid, asyncio
-from typing import Optional, Dict, Deque
-from collections import deque
+from app.services.extract_pool import shutdown_extraction_pool
+from app.services.ingestion import get_ingest_queue
+from app.services.ratelimit import build_rate_limiter, retry_after
+from app.core.inflight import in_flight
+from app.core.metrics import IN_FLIGHT, LATENCY, REQUESTS, UNROUTED, render as render_metrics
+from prometheus_client import CONTENT_TYPE_LATEST
+import os, time, uuid, asyncio
+from typing import Optional
 from starlette import status
 
-REQUESTS = Counter("http_requests_total", "Total HTTP requests", ["method", "path", "status"])
-LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ["path"])
-_ACTIVE_REQUESTS = 0
+class EdgeMiddleware:
+    """Per-request edge concerns in one pure-ASGI pass.
+
+    In order: request id + metrics, rate limit, size limit (Content-Length,
+    then the streamed body itself), content type, and a timeout on the time
+    to the first response byte (streamed bodies may run longer). Security
+    headers are added to every response.
+    """
+
+    ALLOWED_CONTENT_TYPES = ("application/json", "multipart/form-data", "text/plain")
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        window_s: int = 60,
+        max_requests: int = 120,
+        max_body_bytes: Optional[int] = None,
+        timeout_s: Optional[float] = None,
+    ):
+        self.app = app
+        self.limiter = build_rate_limiter(window_s, max_requests)
+        self.max_body_bytes = max_body_bytes or settings.MAX_UPLOAD_MB * 1024 * 1024
+        self.timeout_s = timeout_s or settings.REQUEST_TIMEOUT_S
+        security = [
+            (b"x-content-type-options", b"nosniff"),
+            (b"x-frame-options", b"DENY"),
+            (b"referrer-policy", b"no-referrer"),
+            (b"content-security-policy", b"default-src 'self'"),
+        ]
+        if settings.ENV != "dev":
+            security.append((b"strict-transport-security", b"max-age=31536000; includeSubDomains"))
+        self.security_headers = security
 
-class RequestContextMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        req_id = str(uuid.uuid4())
-        set_request_id(req_id)
+    @staticmethod
+    def _client_ip(headers: Headers, scope: Scope) -> str:
+        xff = headers.get("x-forwarded-for")
+        if xff:
+            return xff.split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def _reject(self, scope: Scope) -> Optional[Response]:
+        headers = Headers(scope=scope)
+        # synchronous: the sqlite backend waits at most RATE_LIMIT_SQLITE_BUSY_TIMEOUT_MS, then fails open
+        wait = self.limiter.acquire(self._client_ip(headers, scope))
+        if wait > 0:
+            return JSONResponse(
+                {"detail": "Too Many Requests"},
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": retry_after(wait)},
+            )
+        cl = headers.get("content-length")
+        if cl and cl.isdigit() and int(cl) > self.max_body_bytes:
+            return JSONResponse({"detail": "Request too large"}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        if scope["method"] in ("POST", "PUT", "PATCH"):
+            ctype = headers.get("content-type", "").split(";")[0].strip().lower()
+            if not any(ctype.startswith(a) for a in self.ALLOWED_CONTENT_TYPES):
+                return JSONResponse({"detail": "Unsupported Media Type"}, status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        return None
+
+    def _limit_body(self, receive: Receive) -> Receive:
+        # Content-Length can be absent (chunked) or wrong: count what arrives.
+        # An HTTPException passes through FastAPI's body parsing untouched.
+        received = 0
+
+        async def limited() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Request too large")
+            return message
+
+        return limited
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        set_request_id(str(uuid.uuid4()))
         start = time.time()
-        global _ACTIVE_REQUESTS
-        _ACTIVE_REQUESTS += 1
+        in_flight.enter()
+        IN_FLIGHT.inc()
+        status_code = 500
+        deadline: Optional[asyncio.Timeout] = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if deadline is not None and not deadline.expired():
+                    deadline.reschedule(None)  # headers are out: let the body stream
+                headers = list(message.get("headers", ()))
+                present = {k.lower() for k, _ in headers}
+                headers.extend(h for h in self.security_headers if h[0] not in present)
+                message = {**message, "headers": headers}
+            await send(message)
+
         try:
-            response = await call_next(request)
-            status_code = getattr(response, "status_code", 500)
+            rejected = self._reject(scope)
+            if rejected is not None:
+                await rejected(scope, receive, send_wrapper)
+                return
+            try:
+                async with asyncio.timeout(self.timeout_s) as deadline:
+                    await self.app(scope, self._limit_body(receive), send_wrapper)
+            except TimeoutError:
+                if not deadline.expired():
+                    raise
+                await JSONResponse({"detail": "Request timeout"}, status_code=status.HTTP_408_REQUEST_TIMEOUT)(
+                    scope, receive, send_wrapper
+                )
         except Exception as e:
             status_code = 500
             log.error("unhandled_exception", error=str(e))
             raise
         finally:
-            dur = time.time() - start
-            REQUESTS.labels(request.method, request.url.path, status_code).inc()
-            try:
-                LATENCY.labels(request.url.path).observe(dur)
-            except Exception:
-                pass
-            _ACTIVE_REQUESTS = max(0, _ACTIVE_REQUESTS - 1)
-        return response
-
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        response.headers.setdefault("X-Content-Type-Options", "nosniff")
-        response.headers.setdefault("X-Frame-Options", "DENY")
-        response.headers.setdefault("Referrer-Policy", "no-referrer")
-        response.headers.setdefault("Content-Security-Policy", "default-src 'self'")
-        if settings.ENV != "dev":
-            response.headers.setdefault("Strict-Transport-Security", "max-age=31536000; includeSubDomains")
-        return response
-
-
-class SizeLimitMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        max_bytes = settings.MAX_UPLOAD_MB * 1024 * 1024
-        cl = request.headers.get("content-length")
-        if cl and cl.isdigit() and int(cl) > max_bytes:
-            return JSONResponse({"detail": "Request too large"}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
-        return await call_next(request)
-
-
-class ContentTypeCheckMiddleware(BaseHTTPMiddleware):
-    ALLOWED = {"application/json", "multipart/form-data", "text/plain"}
-
-    async def dispatch(self, request: Request, call_next):
-        if request.method in ("POST", "PUT", "PATCH"):
-            ctype = request.headers.get("content-type", "").split(";")[0].strip().lower()
-            if not any(ctype.startswith(a) for a in self.ALLOWED):
-                return JSONResponse({"detail": "Unsupported Media Type"}, status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
-        return await call_next(request)
-
+            # the router stores the matched route in the scope
+            route = scope.get("route")
+            path = getattr(route, "path", None) or UNROUTED
+            REQUESTS.labels(scope["method"], path, status_code).inc()
+            LATENCY.labels(path).observe(time.time() - start)
+            in_flight.exit()
+            IN_FLIGHT.dec()
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    # Simple in-memory sliding-window limiter for dev use.
-    def __init__(self, app, window_s: int = 60, max_requests: int = 120):
-        super().__init__(app)
-        self.window_s = window_s
-        self.max_requests = max_requests
-        self.buckets: Dict[str, Deque[float]] = {}
-
-    def _get_ip(self, request: Request) -> str:
-        xff = request.headers.get("x-forwarded-for")
-        if xff:
-            return xff.split(",")[0].strip()
-        return request.client.host if request.client else "unknown"
-
-    async def dispatch(self, request: Request, call_next):
-        now = time.time()
-        ip = self._get_ip(request)
-        dq = self.buckets.setdefault(ip, deque())
-        while dq and now - dq[0] > self.window_s:
-            dq.popleft()
-        if len(dq) >= self.max_requests:
-            return JSONResponse({"detail": "Too Many Requests"}, status_code=status.HTTP_429_TOO_MANY_REQUESTS)
-        dq.append(now)
-        return await call_next(request)
-
-
-class TimeoutMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, timeout_s: Optional[int] = None):
-        super().__init__(app)
-        self.timeout_s = timeout_s or settings.REQUEST_TIMEOUT_S
-
-    async def dispatch(self, request: Request, call_next):
-        try:
-            return await asyncio.wait_for(call_next(request), timeout=self.timeout_s)
-        except asyncio.TimeoutError:
-            return JSONResponse({"detail": "Request timeout"}, status_code=status.HTTP_408_REQUEST_TIMEOUT)
 
 app = FastAPI(title="Legal Intel Backend", version="0.1.0")
 
@@ -121,33 +156,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Order: context -> rate-limit -> size/content checks -> timeout -> security
-app.add_middleware(RequestContextMiddleware)
+# Outermost: request context, rate limit, size/content checks, timeout, security headers
 app.add_middleware(
-    RateLimitMiddleware,
+    EdgeMiddleware,
     window_s=settings.RATE_LIMIT_WINDOW_S,
     max_requests=settings.RATE_LIMIT_MAX_REQUESTS,
 )
-app.add_middleware(SizeLimitMiddleware)
-app.add_middleware(ContentTypeCheckMiddleware)
-app.add_middleware(TimeoutMiddleware)
-app.add_middleware(SecurityHeadersMiddleware)
 
 # Routers
 app.include_router(api_router, prefix=settings.API_PREFIX)
 
 @app.on_event("startup")
 async def on_startup():
-    init_db()
+    if not os.environ.get(INIT_DB_DONE_ENV):  # preloaded gunicorn workers: the master already ran it
+        init_db()
+    # picks up jobs left queued or orphaned by a previous process
+    get_ingest_queue().start()
 
 
 @app.on_event("shutdown")
 async def on_shutdown():
-    # Wait for in-flight requests to finish (best-effort)
+    # Wait for this worker's in-flight requests to finish (best-effort)
+    in_flight.begin_drain()
     deadline = time.time() + settings.SHUTDOWN_GRACE_PERIOD_S
-    while _ACTIVE_REQUESTS > 0 and time.time() < deadline:
+    while in_flight.count > 0 and time.time() < deadline:
         await asyncio.sleep(0.1)
-    log.info("graceful_shutdown_complete", active_requests=_ACTIVE_REQUESTS)
+    await asyncio.to_thread(get_ingest_queue().stop, settings.SHUTDOWN_GRACE_PERIOD_S)
+    shutdown_extraction_pool()
+    await async_engine.dispose()
+    log.info("graceful_shutdown_complete", active_requests=in_flight.count, active_requests_all_workers=in_flight.total())
+    shutdown_logging()
 
 @app.get("/healthz")
 async def healthz():
@@ -156,12 +194,16 @@ async def healthz():
 @app.get("/readyz")
 async def readyz():
     # In real prod: test DB connectivity & downstreams
-    return {"ready": True}
+    if in_flight.draining:
+        return JSONResponse(
+            {"ready": False, "draining": True, "in_flight": in_flight.total()},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    return {"ready": True, "in_flight": in_flight.total()}
 
 @app.get("/metrics")
 async def metrics():
-    data = generate_latest()
-    return PlainTextResponse(data.decode("utf-8"), media_type=CONTENT_TYPE_LATEST)
+    return PlainTextResponse(render_metrics().decode("utf-8"), media_type=CONTENT_TYPE_LATEST)
 
 # --- DEBUG: list all registered routes (remove later) ---
 @app.get("/__debug/routes")
@@ -0,0 +1,8 @@
+from sqlmodel import SQLModel, Field
+
+
+class CorpusVersion(SQLModel, table=True):
+    """Single-row counter bumped whenever ingestion commits new documents."""
+
+    id: int = Field(default=1, primary_key=True)
+    version: int = Field(default=0, ge=0)
@@ -1,16 +1,20 @@
 from typing import Optional
 from datetime import datetime
 from sqlmodel import SQLModel, Field
-from sqlalchemy import Text
+from sqlalchemy import Index, LargeBinary
 
 class Document(SQLModel, table=True):
+    __table_args__ = (Index("ix_document_content_hash_extractor", "content_hash", "extractor_version"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
     filename: str = Field(index=True, max_length=255)
     content_type: Optional[str] = Field(default=None, max_length=100)
     size_bytes: int = Field(ge=0)
-
-    text: Optional[str] = Field(default=None, sa_type=Text)
+    content_hash: Optional[str] = Field(default=None, max_length=64)  # sha256 of the uploaded bytes
+    extractor_version: Optional[int] = Field(default=None)
+    # set on rows created from an identical upload; the body lives on the original
+    duplicate_of: Optional[int] = Field(default=None, foreign_key="document.id")
 
     agreement_type: Optional[str] = Field(default=None, index=True, max_length=100)
     governing_law: Optional[str] = Field(default=None, index=True, max_length=100)
@@ -18,3 +22,18 @@ class Document(SQLModel, table=True):
     industry: Optional[str] = Field(default=None, index=True, max_length=100)
 
     created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False, index=True)
+
+
+class DocumentBody(SQLModel, table=True):
+    """Compressed extracted text, kept out of the hot `document` rows.
+
+    Listing and filtering queries only touch `document`; bodies are read by
+    id when something actually needs the text (see services/bodies.py).
+    """
+
+    __tablename__ = "document_body"
+
+    document_id: int = Field(primary_key=True, foreign_key="document.id")
+    codec: str = Field(default="zlib", max_length=16)
+    raw_bytes: int = Field(default=0, ge=0)  # utf-8 size before compression
+    data: bytes = Field(sa_type=LargeBinary)
@@ -0,0 +1,9 @@
+from sqlmodel import SQLModel, Field
+
+
+class FacetCount(SQLModel, table=True):
+    """Running document count per (facet, value), maintained by ingestion."""
+
+    facet: str = Field(primary_key=True, max_length=50)
+    value: str = Field(primary_key=True, max_length=100)
+    count: int = Field(default=0, ge=0)
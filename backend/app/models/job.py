@@ -0,0 +1,36 @@
+from typing import Optional
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+# IngestJob.status / IngestJobFile.status
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class IngestJob(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    status: str = Field(default=QUEUED, index=True, max_length=20)
+    attempts: int = Field(default=0, ge=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow, nullable=False, index=True)
+    # a running job whose lease has expired is presumed orphaned and may be reclaimed
+    lease_until: Optional[datetime] = Field(default=None)
+    error: Optional[str] = Field(default=None, max_length=500)
+
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+
+
+class IngestJobFile(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    job_id: int = Field(foreign_key="ingestjob.id", index=True)
+
+    path: str = Field(max_length=500)
+    original_name: str = Field(max_length=255)
+    content_type: str = Field(max_length=100)
+    size_bytes: int = Field(ge=0)
+    content_hash: Optional[str] = Field(default=None, max_length=64)
+
+    status: str = Field(default=QUEUED, max_length=20)
+    attempts: int = Field(default=0, ge=0)
+    error: Optional[str] = Field(default=None, max_length=500)
+    document_id: Optional[int] = Field(default=None, foreign_key="document.id")
@@ -0,0 +1,68 @@
+"""
+Compressed document bodies.
+
+Extracted text lives in `document_body`, zlib-compressed, one row per
+original document. Rows created from an identical upload share the
+original's body through `Document.duplicate_of`, so every lookup here
+resolves that link first.
+"""
+import zlib
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+from sqlmodel import Session, delete, select
+
+from app.models.document import Document, DocumentBody
+
+CODEC = "zlib"
+COMPRESS_LEVEL = 6
+
+
+def compress_text(text: str) -> Tuple[bytes, int]:
+    raw = text.encode("utf-8")
+    return zlib.compress(raw, COMPRESS_LEVEL), len(raw)
+
+
+def decompress_text(codec: str, data: bytes) -> str:
+    if codec != CODEC:
+        raise ValueError(f"unknown body codec {codec!r}")
+    return zlib.decompress(data).decode("utf-8")
+
+
+def store_bodies(session: Session, bodies: Mapping[int, str]) -> None:
+    """Write bodies keyed by document id (the documents must already have ids)."""
+    rows = []
+    for doc_id, text in bodies.items():
+        data, raw_bytes = compress_text(text)
+        rows.append({"document_id": doc_id, "codec": CODEC, "raw_bytes": raw_bytes, "data": data})
+    if rows:
+        session.exec(DocumentBody.__table__.insert(), params=rows)
+
+
+def replace_bodies(session: Session, bodies: Mapping[int, str]) -> None:
+    """Overwrite stored bodies keyed by document id."""
+    if bodies:
+        session.exec(delete(DocumentBody).where(DocumentBody.document_id.in_(list(bodies))))
+        store_bodies(session, bodies)
+
+
+def load_bodies(session: Session, docs: Iterable[Document]) -> Dict[int, str]:
+    """Text for each document id (duplicates resolve to their original's body)."""
+    owner = {d.id: d.duplicate_of or d.id for d in docs}
+    if not owner:
+        return {}
+    stored = {
+        b.document_id: decompress_text(b.codec, b.data)
+        for b in session.exec(select(DocumentBody).where(DocumentBody.document_id.in_(set(owner.values()))))
+    }
+    return {doc_id: stored[src] for doc_id, src in owner.items() if src in stored}
+
+
+def iter_bodies(session: Session, after_id: int, limit: int) -> List[Tuple[int, str]]:
+    """(document id, text) for stored bodies with id > `after_id`, in id order."""
+    rows = session.exec(
+        select(DocumentBody)
+        .where(DocumentBody.document_id > after_id)
+        .order_by(DocumentBody.document_id)
+        .limit(limit)
+    )
+    return [(b.document_id, decompress_text(b.codec, b.data)) for b in rows]
@@ -0,0 +1,78 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from fastapi import Request
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.metrics import CACHE_LOOKUPS
+from app.models.corpus import CorpusVersion
+
+
+def corpus_version(session: Session) -> int:
+    # a query, not session.get(): a second read in the same session must see new commits
+    return session.exec(select(CorpusVersion.version).where(CorpusVersion.id == 1)).first() or 0
+
+
+def bump_corpus_version(session: Session) -> None:
+    """Invalidate cached reads. Call inside the transaction that changes the corpus."""
+    res = session.exec(update(CorpusVersion).where(CorpusVersion.id == 1).values(version=CorpusVersion.version + 1))
+    if res.rowcount == 0:
+        session.add(CorpusVersion(id=1, version=1))
+
+
+def make_etag(version: int, *parts: Any) -> str:
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {c.strip().removeprefix("W/") for c in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+class ResponseCache:
+    """Thread-safe bounded LRU. Keys embed the corpus version, so stale entries just age out."""
+
+    def __init__(self, maxsize: int, name: str = "response") -> None:
+        self.maxsize = maxsize
+        self.name = name
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = CACHE_LOOKUPS.labels(cache=name, result="hit")
+        self._misses = CACHE_LOOKUPS.labels(cache=name, result="miss")
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                self._misses.inc()
+                return None
+            self._data.move_to_end(key)
+            self._hits.inc()
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_SIZE, name="dashboard")
+# normalized question -> parsed query (pure, never invalidated)
+query_parse_cache = ResponseCache(settings.QUERY_PARSE_CACHE_SIZE, name="query_parse")
+# (parsed query, paging, corpus version) -> hits
+query_result_cache = ResponseCache(settings.QUERY_RESULT_CACHE_SIZE, name="query_results")
@@ -1,16 +1,58 @@
 from collections import Counter
-from typing import Iterable
+from typing import Dict, Iterable
+
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+
 from app.models.document import Document
+from app.models.facet import FacetCount
+
+# dashboard key -> Document column it counts
+FACETS: Dict[str, str] = {
+    "agreement_types": "agreement_type",
+    "jurisdictions": "governing_law",
+    "industries": "industry",
+    "geographies": "geography",
+}
+UNKNOWN = "Unknown"
+
+
+def _facet_deltas(docs: Iterable[Document]) -> Counter:
+    deltas: Counter = Counter()
+    for d in docs:
+        for facet, column in FACETS.items():
+            deltas[(facet, getattr(d, column) or UNKNOWN)] += 1
+    return deltas
+
+
+def bump_facet_counts(session: Session, docs: Iterable[Document]) -> None:
+    """Add `docs` to the facet counts. Call inside the transaction that inserts them."""
+    for (facet, value), n in _facet_deltas(docs).items():
+        res = session.exec(
+            update(FacetCount)
+            .where(FacetCount.facet == facet, FacetCount.value == value)
+            .values(count=FacetCount.count + n)
+        )
+        if res.rowcount == 0:
+            session.add(FacetCount(facet=facet, value=value, count=n))
+
+
+def rebuild_facet_counts(session: Session) -> None:
+    """Recompute the counts table from grouped queries over the document metadata."""
+    session.exec(FacetCount.__table__.delete())
+    for facet, column in FACETS.items():
+        col = getattr(Document, column)
+        rows = session.exec(select(func.coalesce(col, UNKNOWN), func.count()).group_by(func.coalesce(col, UNKNOWN)))
+        for value, n in rows:
+            session.add(FacetCount(facet=facet, value=value, count=n))
+    session.commit()
+
 
-def build_dashboard(docs: Iterable[Document]) -> dict:
-    agreement_types = Counter([d.agreement_type or "Unknown" for d in docs])
-    jurisdictions = Counter([d.governing_law or "Unknown" for d in docs])
-    industries = Counter([d.industry or "Unknown" for d in docs])
-    geographies = Counter([d.geography or "Unknown" for d in docs])
-    return {
-        "agreement_types": dict(agreement_types),
-        "jurisdictions": dict(jurisdictions),
-        "industries": dict(industries),
-        "geographies": dict(geographies),
-        "count_documents": len(list(docs)),
-    }
+def build_dashboard(session: Session) -> dict:
+    resp: dict = {facet: {} for facet in FACETS}
+    for row in session.exec(select(FacetCount).where(FacetCount.count > 0)):
+        if row.facet in resp:
+            resp[row.facet][row.value] = row.count
+    # every document lands in exactly one bucket per facet
+    resp["count_documents"] = sum(resp["agreement_types"].values())
+    return resp
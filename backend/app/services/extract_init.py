@@ -0,0 +1,19 @@
+"""
+Start-up hook for extraction pool processes.
+
+Deliberately free of app imports: it runs in each freshly spawned child
+before the task function's module, and with it prometheus_client, is
+imported.
+"""
+import os
+
+
+def init_extract_worker(nice: int = 0) -> None:
+    if nice:
+        os.nice(nice)  # background work yields the CPU to request handling and first-pass extraction
+    # Under gunicorn the parent's PROMETHEUS_MULTIPROC_DIR is inherited: every
+    # child would write its own per-pid sample files there, left behind each
+    # time a child is recycled or replaced and merged into every scrape. The
+    # children record nothing worth scraping (extraction timings are observed
+    # by the parent), so they keep their metrics in memory.
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
@@ -0,0 +1,235 @@
+"""
+Process-pool text extraction for ingestion.
+
+PDF and DOCX parsing is pure-Python and CPU-bound, so it runs in a small
+pool of worker processes instead of the API worker. Plain-text files are
+cheap and read inline. Each file gets its own wall-clock timeout, and a
+file that hangs or crashes a worker is failed alone: the pool is torn
+down and rebuilt, and the other in-flight files are retried.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+from app.core.config import settings
+from app.core.logging import log
+from app.core.metrics import EXTRACT_TEXT_SECONDS
+from app.services.extract_init import init_extract_worker
+from app.services.extraction import Extraction, PdfBudget, stream_pdf
+from app.services.text_utils import extract_text_from_file
+
+
+@dataclass
+class ExtractResult:
+    text: Optional[str] = None
+    error: Optional[str] = None
+    metadata: Optional[dict] = None  # already classified (streamed PDFs)
+    complete: bool = True  # False: text covers only the pages read within the budget
+
+    @classmethod
+    def of(cls, value: Union[str, Extraction]) -> "ExtractResult":
+        if isinstance(value, str):
+            return cls(text=value)
+        return cls(text=value.text, metadata=value.metadata, complete=value.complete)
+
+
+def content_kind(path: str, content_type: str) -> str:
+    # mirrors the dispatch in text_utils.extract_text_from_file
+    ext = os.path.splitext(path)[1].lower()
+    if content_type.endswith("pdf") or ext == ".pdf":
+        return "pdf"
+    if "word" in content_type or ext == ".docx":
+        return "docx"
+    return "text"
+
+
+def extract_document(path: str, content_type: str) -> Extraction:
+    """The pool's default job: text, or a budgeted page-streamed read for PDFs in streaming mode."""
+    if settings.PDF_EXTRACT_MODE == "streaming" and content_kind(path, content_type) == "pdf":
+        budget = PdfBudget(settings.PDF_MAX_PAGES, settings.PDF_MAX_CHARS, settings.PDF_MAX_SECONDS)
+        return stream_pdf(path, budget, early_exit=settings.PDF_EARLY_EXIT)
+    return Extraction(extract_text_from_file(path, content_type))
+
+
+def needs_pool(path: str, content_type: str) -> bool:
+    return content_kind(path, content_type) != "text"
+
+
+def _observe(item: Tuple[str, str], started: float) -> None:
+    EXTRACT_TEXT_SECONDS.labels(kind=content_kind(*item)).observe(time.monotonic() - started)
+
+
+class ExtractionPool:
+    def __init__(
+        self,
+        workers: int,
+        timeout_s: float,
+        max_tasks_per_child: int = 0,
+        func: Callable[[str, str], Union[str, Extraction]] = extract_document,
+        nice: int = 0,
+    ) -> None:
+        self.func = func
+        self.nice = nice  # added to the worker processes' niceness
+        self.workers = workers
+        self.timeout_s = timeout_s
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # one batch drives the pool at a time, so timeouts measure run time, not queueing
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # spawn: never fork a process that is running threads
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=self.max_tasks_per_child or None,
+                initializer=init_extract_worker,  # runs before the task module is imported
+                initargs=(self.nice,),
+            )
+        return self._executor
+
+    def _discard_executor(self) -> None:
+        ex, self._executor = self._executor, None
+        if ex is None:
+            return
+        for p in list(getattr(ex, "_processes", {}).values()):
+            p.terminate()
+        ex.shutdown(wait=False, cancel_futures=True)
+
+    def _extract_inline(self, func: Callable, path: str, content_type: str) -> ExtractResult:
+        started = time.monotonic()
+        try:
+            return ExtractResult.of(func(path, content_type))
+        except Exception as e:
+            return ExtractResult(error=f"{type(e).__name__}: {e}")
+        finally:
+            _observe((path, content_type), started)
+
+    def extract_many(self, items: Sequence[Tuple[str, str]], func: Optional[Callable] = None) -> List[ExtractResult]:
+        """Extract text for (path, content_type) pairs; results line up with `items`.
+
+        `func` overrides the pool's extraction function for this call.
+        """
+        func = func or self.func
+        results: List[Optional[ExtractResult]] = [None] * len(items)
+        pending: Deque[int] = deque()
+        for i, (path, ctype) in enumerate(items):
+            if self.workers > 0 and needs_pool(path, ctype):
+                pending.append(i)
+            else:
+                results[i] = self._extract_inline(func, path, ctype)
+        if pending:
+            with self._lock:
+                self._run(func, items, pending, results)
+        return [r or ExtractResult(error="not processed") for r in results]
+
+    def _run(self, func: Callable, items: Sequence[Tuple[str, str]], pending: Deque[int], results: List[Optional[ExtractResult]]) -> None:
+        # Files in flight when a worker died are re-run one at a time, so a
+        # second crash identifies the culprit without failing its neighbours.
+        suspects: Deque[int] = deque()
+        inflight: Dict[Future, Tuple[int, float]] = {}
+
+        def fail(i: int, error: str) -> None:
+            path = items[i][0]
+            log.error("extract_pool_file_failed", path=path, error=error)
+            results[i] = ExtractResult(error=error)
+
+        while pending or suspects or inflight:
+            ex = self._get_executor()
+            if suspects and not inflight:
+                i = suspects.popleft()
+                inflight[ex.submit(func, *items[i])] = (i, time.monotonic())
+            elif not suspects:
+                while pending and len(inflight) < self.workers:
+                    i = pending.popleft()
+                    inflight[ex.submit(func, *items[i])] = (i, time.monotonic())
+
+            deadline = min(started for _, started in inflight.values()) + self.timeout_s
+            done, _ = wait(list(inflight), timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+
+            broken: List[int] = []
+            for fut in done:
+                i, started = inflight.pop(fut)
+                _observe(items[i], started)
+                try:
+                    results[i] = ExtractResult.of(fut.result())
+                except BrokenProcessPool:
+                    broken.append(i)
+                except Exception as e:
+                    results[i] = ExtractResult(error=f"{type(e).__name__}: {e}")
+
+            if broken:
+                broken.extend(i for i, _ in inflight.values())
+                inflight.clear()
+                self._discard_executor()
+                if len(broken) == 1:
+                    # it was running alone, so it is the culprit
+                    fail(broken[0], "extraction worker crashed")
+                else:
+                    log.warn("extract_pool_worker_crashed", suspects=len(broken))
+                    suspects.extend(broken)
+                continue
+
+            now = time.monotonic()
+            expired = [fut for fut, (_, started) in inflight.items() if now - started >= self.timeout_s]
+            if expired:
+                for fut in expired:
+                    i, started = inflight.pop(fut)
+                    _observe(items[i], started)
+                    fail(i, f"extraction timed out after {self.timeout_s}s")
+                # the survivors were not at fault; run them again on a fresh pool
+                pending.extendleft(i for i, _ in inflight.values())
+                inflight.clear()
+                self._discard_executor()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._discard_executor()
+
+
+_pool: Optional[ExtractionPool] = None
+_full_text_pool: Optional[ExtractionPool] = None
+_pool_lock = threading.Lock()
+FULL_TEXT_NICE = 10
+
+
+def get_extraction_pool() -> ExtractionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExtractionPool(
+                workers=settings.EXTRACT_WORKERS,
+                timeout_s=settings.EXTRACT_TIMEOUT_S,
+                max_tasks_per_child=settings.EXTRACT_MAX_TASKS_PER_CHILD,
+            )
+        return _pool
+
+
+def get_full_text_pool() -> ExtractionPool:
+    """Pool for the deferred whole-PDF pass: separate processes, lock and (much
+    longer) timeout, so a multi-minute parse neither queues nor times out
+    first-pass extraction for the jobs behind it."""
+    global _full_text_pool
+    with _pool_lock:
+        if _full_text_pool is None:
+            _full_text_pool = ExtractionPool(
+                workers=settings.PDF_FULL_TEXT_WORKERS,
+                timeout_s=settings.PDF_FULL_TEXT_TIMEOUT_S,
+                max_tasks_per_child=settings.EXTRACT_MAX_TASKS_PER_CHILD,
+                func=extract_text_from_file,
+                nice=FULL_TEXT_NICE,
+            )
+        return _full_text_pool
+
+
+def shutdown_extraction_pool() -> None:
+    for pool in (_pool, _full_text_pool):
+        if pool is not None:
+            pool.shutdown()
@@ -1,5 +1,12 @@
-import re
-from typing import Optional, Sequence, Dict
+import time
+from typing import NamedTuple, Optional, Sequence, Dict, List
+
+from app.services.text_utils import iter_pdf_pages
+from app.utils.matching import Hits, TermMatcher, first_hit
+
+# Bump whenever vocabularies or text extraction change: stored extractions
+# are reused for identical uploads only when their version matches.
+EXTRACTOR_VERSION = 1
 
 AGREEMENT_TYPES = [
     "NDA", "Non-Disclosure Agreement", "MSA", "Master Services Agreement",
@@ -9,21 +16,93 @@ JURISDICTIONS = ["UAE", "UK", "Delaware", "US", "EU", "KSA", "Dubai", "Abu Dhabi
 GEOGRAPHIES = ["Middle East", "Europe", "Asia", "GCC", "United States"]
 INDUSTRIES = ["Oil & Gas", "Healthcare", "Technology", "Finance", "Retail"]
 
-def _find_first(tokens: Sequence[str], text: str) -> Optional[str]:
-    for t in tokens:
-        if re.search(rf"\b{re.escape(t)}\b", text, flags=re.I):
-            return t if len(t) < 40 else t[:40]
-    return None
+VOCABULARIES: Dict[str, List[str]] = {
+    "agreement_type": AGREEMENT_TYPES,
+    "governing_law": JURISDICTIONS,
+    "geography": GEOGRAPHIES,
+    "industry": INDUSTRIES,
+}
+# any mention of "non-disclosure" (even mid-word) classifies the document as an NDA
+NDA_MARKER = "non-disclosure"
 
-def extract_metadata(text: str) -> dict:
-    # Very simple heuristics using regular expressions
-    agreement_type = _find_first(AGREEMENT_TYPES, text) or "Unknown"
-    governing_law = _find_first(JURISDICTIONS, text)
-    geography = _find_first(GEOGRAPHIES, text)
-    industry = _find_first(INDUSTRIES, text)
+# Compiled once: every vocabulary is matched in a single pass over the text.
+_MATCHER = TermMatcher(VOCABULARIES, substrings={"nda_marker": [NDA_MARKER]})
+
+
+def _find_first(tokens: Sequence[str], hits: Dict[str, List[int]]) -> Optional[str]:
+    t = first_hit(tokens, hits)
+    if t is None:
+        return None
+    return t if len(t) < 40 else t[:40]
+
+
+def find_vocabulary_hits(text: str) -> Hits:
+    """Every vocabulary hit as {field: {term: [offsets]}}; counts are len(offsets)."""
+    return _MATCHER.scan(text)
+
+
+def metadata_from_hits(hits: Hits) -> dict:
+    agreement_type = _find_first(AGREEMENT_TYPES, hits["agreement_type"]) or "Unknown"
     return {
-        "agreement_type": "NDA" if "non-disclosure" in text.lower() else agreement_type,
-        "governing_law": governing_law,
-        "geography": geography,
-        "industry": industry,
+        "agreement_type": "NDA" if hits["nda_marker"] else agreement_type,
+        "governing_law": _find_first(JURISDICTIONS, hits["governing_law"]),
+        "geography": _find_first(GEOGRAPHIES, hits["geography"]),
+        "industry": _find_first(INDUSTRIES, hits["industry"]),
     }
+
+
+def extract_metadata(text: str) -> dict:
+    # Vocabulary heuristics, first match by priority order
+    return metadata_from_hits(find_vocabulary_hits(text))
+
+
+# --- page-streamed PDFs ---
+
+class PdfBudget(NamedTuple):
+    """Limits for reading one PDF; 0 means unlimited."""
+    max_pages: int = 0
+    max_chars: int = 0
+    max_seconds: float = 0.0
+
+
+class Extraction(NamedTuple):
+    text: str
+    metadata: Optional[dict] = None  # classified while reading; None -> classify `text`
+    complete: bool = True  # False: `text` is only the pages read before stopping
+
+
+def _resolved(hits: Hits) -> bool:
+    # every field has a candidate; later pages could only add lower-priority alternatives
+    return bool(hits["agreement_type"] or hits["nda_marker"]) and all(
+        hits[field] for field in ("governing_law", "geography", "industry")
+    )
+
+
+def stream_pdf(path: str, budget: PdfBudget = PdfBudget(), early_exit: bool = True) -> Extraction:
+    """
+    Read a PDF page by page, feeding each page to the vocabulary matcher, and
+    stop at the first of: the end of the file, every field resolved (if
+    `early_exit`), or a budget limit. When reading stops early the metadata
+    comes from the pages read: a higher-priority term that only appears
+    later is not seen.
+    """
+    started = time.monotonic()
+    hits: Hits = {label: {} for label in _MATCHER.labels}
+    pages: List[str] = []
+    chars = 0
+    for page, is_last in iter_pdf_pages(path):
+        for label, terms in _MATCHER.scan(page, base=chars).items():
+            for term, offsets in terms.items():
+                hits[label].setdefault(term, []).extend(offsets)
+        pages.append(page)
+        chars += len(page)
+        if is_last:
+            break
+        if (
+            (early_exit and _resolved(hits))
+            or (budget.max_pages and len(pages) >= budget.max_pages)
+            or (budget.max_chars and chars >= budget.max_chars)
+            or (budget.max_seconds and time.monotonic() - started >= budget.max_seconds)
+        ):
+            return Extraction("".join(pages), metadata_from_hits(hits), complete=False)
+    return Extraction("".join(pages), metadata_from_hits(hits))
@@ -0,0 +1,260 @@
+"""
+Columnar facet engine for filtered dashboards.
+
+Document metadata is held in memory column by column: one int32 code
+array per facet (with a code -> value dictionary), plus the creation day
+and year of each document. Each (column, value) has a bitmap of the rows
+carrying it, 64 rows per uint64 word. A filter is a few bitwise ORs
+(values within a column) and ANDs (across columns); every count under
+it, cross-tabs included, is a popcount of the filter ANDed with a value's
+bitmap, so a query costs the same however many documents match.
+
+The snapshot is loaded on the first facets request a worker serves and
+topped up from the database (ids above the last loaded) whenever a request
+sees a newer corpus version; workers that never serve facets never build
+it. Documents are never updated in place, so appending is enough.
+"""
+from __future__ import annotations
+
+import threading
+from datetime import date
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.core.logging import log
+from app.db.session import get_read_session
+from app.models.document import Document
+from app.services.cache import corpus_version
+from app.services.dashboard import FACETS, UNKNOWN
+
+# filterable columns, in the order sync() selects them
+COLUMNS: Tuple[str, ...] = ("agreement_type", "governing_law", "geography", "industry")
+YEAR = "year"  # bitmap key for the creation-year pseudo column
+SYNC_CHUNK = 5000
+_EPOCH = date(1970, 1, 1)
+
+
+def day_number(d: date) -> int:
+    return (d - _EPOCH).days
+
+
+def _pack(flags: np.ndarray) -> np.ndarray:
+    """Bitmap of a boolean array, 64 rows per uint64 word (unused trailing bits are 0)."""
+    packed = np.packbits(flags)
+    return np.pad(packed, (0, -len(packed) % 8)).view(np.uint64)
+
+
+def _popcount(bits: np.ndarray) -> int:
+    return int(np.bitwise_count(bits).sum())
+
+
+class _Snapshot:
+    """Immutable columns plus a lazily filled bitmap cache; replaced whole on every append."""
+
+    def __init__(
+        self, ids: np.ndarray, days: np.ndarray, years: np.ndarray,
+        codes: Dict[str, np.ndarray], values: Dict[str, List[str]],
+    ) -> None:
+        self.ids = ids
+        self.days = days
+        self.years = years  # years since 1970, used as the "year" column's codes
+        self.codes = codes
+        self.values = values
+        self.lookup = {c: {v: i for i, v in enumerate(vs)} for c, vs in values.items()}
+        self.year_codes = np.flatnonzero(np.bincount(years)) if len(years) else np.empty(0, np.int64)
+        self._bitmaps: Dict[Tuple[str, int], np.ndarray] = {}
+
+    def bitmap(self, column: str, code: int) -> np.ndarray:
+        bits = self._bitmaps.get((column, code))
+        if bits is None:
+            col = self.years if column == YEAR else self.codes[column]
+            bits = self._bitmaps[(column, code)] = _pack(col == code)
+        return bits
+
+    def warm(self) -> None:
+        """Build every bitmap now rather than on the first request that needs it."""
+        for column in COLUMNS:
+            for code in range(len(self.values[column])):
+                self.bitmap(column, code)
+        for code in self.year_codes:
+            self.bitmap(YEAR, int(code))
+
+
+def _empty() -> _Snapshot:
+    return _Snapshot(
+        np.empty(0, np.int64), np.empty(0, np.int32), np.empty(0, np.int16),
+        {c: np.empty(0, np.int32) for c in COLUMNS}, {c: [] for c in COLUMNS},
+    )
+
+
+class FacetIndex:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()  # one load at a time; concurrent requests wait for it
+        self.version = -1  # corpus version the snapshot reflects
+        self._snap = _empty()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._snap = _empty()
+            self.version = -1
+
+    def __len__(self) -> int:
+        return len(self._snap.ids)
+
+    @property
+    def last_id(self) -> int:
+        ids = self._snap.ids
+        return int(ids[-1]) if len(ids) else 0
+
+    def add(self, rows: Sequence[Tuple]) -> int:
+        """Append (id, created_at, *COLUMNS) rows with ids above `last_id`, in id order."""
+        return self.extend([rows])
+
+    def extend(self, chunks: Iterable[Sequence[Tuple]]) -> int:
+        """Append chunks of rows as `add` does, growing each column once for all of them."""
+        with self._lock:
+            snap = self._snap
+            last_id = self.last_id
+            values = {c: list(vs) for c, vs in snap.values.items()}
+            lookup = {c: dict(m) for c, m in snap.lookup.items()}
+            ids, days, years = [snap.ids], [snap.days], [snap.years]
+            codes: Dict[str, List[np.ndarray]] = {c: [snap.codes[c]] for c in COLUMNS}
+            added = 0
+            for rows in chunks:
+                rows = [r for r in rows if r[0] > last_id]
+                if not rows:
+                    continue
+                last_id, added = rows[-1][0], added + len(rows)
+                new_codes: Dict[str, List[int]] = {c: [] for c in COLUMNS}
+                for row in rows:
+                    for c, v in zip(COLUMNS, row[2:]):
+                        v = v or UNKNOWN
+                        code = lookup[c].get(v)
+                        if code is None:
+                            code = lookup[c][v] = len(values[c])
+                            values[c].append(v)
+                        new_codes[c].append(code)
+                ids.append(np.fromiter((r[0] for r in rows), np.int64, len(rows)))
+                days.append(np.fromiter((day_number(r[1].date()) for r in rows), np.int32, len(rows)))
+                years.append(np.fromiter((r[1].year - _EPOCH.year for r in rows), np.int16, len(rows)))
+                for c in COLUMNS:
+                    codes[c].append(np.asarray(new_codes[c], np.int32))
+            if not added:
+                return 0
+            self._snap = _Snapshot(
+                np.concatenate(ids), np.concatenate(days), np.concatenate(years),
+                {c: np.concatenate(parts) for c, parts in codes.items()}, values,
+            )
+            return added
+
+    def sync(self, session: Session) -> int:
+        """Load documents stored after the last loaded id. Returns how many were added."""
+        version = corpus_version(session)  # read first: rows committed meanwhile are picked up next time
+        db_max = session.exec(select(func.max(Document.id))).one() or 0
+        if db_max < self.last_id:
+            log.warn("facet_index_reset", loaded_max=self.last_id, db_max=db_max)
+            self.reset()
+        cols = [getattr(Document, c) for c in COLUMNS]
+
+        def chunks():
+            after = self.last_id
+            while True:
+                rows = session.exec(
+                    select(Document.id, Document.created_at, *cols)
+                    .where(Document.id > after)
+                    .order_by(Document.id)
+                    .limit(SYNC_CHUNK)
+                ).all()
+                if not rows:
+                    return
+                after = rows[-1][0]
+                yield rows
+
+        added = self.extend(chunks())
+        self._snap.warm()
+        self.version = version
+        if added:
+            log.info("facet_index_synced", added=added, documents=len(self))
+        return added
+
+    def catch_up(self, version: int) -> None:
+        """
+        Sync on a read session unless the snapshot already reflects `version`.
+
+        Blocking: request handlers run it in a worker thread. Single-flight:
+        while one caller loads, the others wait and then find it done.
+        """
+        with self._sync_lock:
+            if self.version == version:
+                return
+            with get_read_session() as session:
+                self.sync(session)
+
+    def query(
+        self,
+        filters: Mapping[str, Iterable[str]] = {},
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        cross: Optional[Tuple[str, str]] = None,
+    ) -> dict:
+        """
+        Counts per facet value for documents matching every filter.
+
+        `filters` maps a column to accepted values (any of them); dates bound
+        the creation day, `date_from` inclusive and `date_to` exclusive.
+        `cross` names two columns to cross-tabulate.
+        """
+        snap = self._snap  # one consistent snapshot, even if a sync swaps it meanwhile
+        n = len(snap.ids)
+        mask: Optional[np.ndarray] = None  # None means every row
+        for column, wanted in filters.items():
+            bits = np.zeros((n + 63) // 64, np.uint64)
+            for v in wanted:
+                code = snap.lookup[column].get(v)
+                if code is not None:
+                    bits |= snap.bitmap(column, code)
+            mask = bits if mask is None else mask & bits
+        if date_from is not None or date_to is not None:
+            in_range = np.ones(n, bool)
+            if date_from is not None:
+                in_range &= snap.days >= day_number(date_from)
+            if date_to is not None:
+                in_range &= snap.days < day_number(date_to)
+            mask = _pack(in_range) if mask is None else mask & _pack(in_range)
+
+        def count(bits: np.ndarray) -> int:
+            return _popcount(bits if mask is None else bits & mask)
+
+        resp: dict = {"count_documents": n if mask is None else _popcount(mask)}
+        for facet, column in FACETS.items():
+            counts = ((v, count(snap.bitmap(column, code))) for code, v in enumerate(snap.values[column]))
+            resp[facet] = {v: k for v, k in counts if k}
+        counts = ((_EPOCH.year + int(y), count(snap.bitmap(YEAR, int(y)))) for y in snap.year_codes)
+        resp["years"] = {str(y): k for y, k in counts if k}
+        if cross is not None:
+            a, b = cross
+            table: Dict[str, Dict[str, int]] = {}
+            for code_a, va in enumerate(snap.values[a]):
+                bits_a = snap.bitmap(a, code_a) if mask is None else snap.bitmap(a, code_a) & mask
+                for code_b, vb in enumerate(snap.values[b]):
+                    k = _popcount(bits_a & snap.bitmap(b, code_b))
+                    if k:
+                        table.setdefault(va, {})[vb] = k
+            resp["cross"] = {"rows": a, "columns": b, "counts": table}
+        return resp
+
+
+_index: Optional[FacetIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_facet_index() -> FacetIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FacetIndex()
+        return _index
@@ -1,57 +1,544 @@
+"""
+Durable ingestion pipeline.
+
+POST /upload only streams files to disk and enqueues an IngestJob (one row
+per file) in the application database. Worker threads claim jobs with an
+atomic conditional UPDATE, hold a lease they renew while working, and
+write documents plus per-file outcomes in short per-chunk transactions. A job
+whose worker died is reclaimed when its lease expires, so accepted files
+survive restarts. Failures are retried with exponential backoff up to
+INGEST_MAX_ATTEMPTS.
+"""
 import os
-from typing import Iterable, List, Dict  # NEW
-from fastapi import UploadFile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, func, insert, or_, text, update
+from sqlmodel import Session, select
+
 from app.core.config import settings
-from app.services.text_utils import extract_text_from_file
-from app.services.extraction import extract_metadata
 from app.core.logging import log
+from app.core.metrics import (
+    DB_COMMIT_SECONDS, DOCUMENTS, EXTRACT_METADATA_SECONDS, FILES, QUEUE_DEPTH,
+)
+from app.db import get_read_session, get_session
+from app.models.document import Document
+from app.models.job import DONE, FAILED, QUEUED, RUNNING, IngestJob, IngestJobFile
+from app.services.bodies import replace_bodies, store_bodies
+from app.services.cache import bump_corpus_version
+from app.services.dashboard import bump_facet_counts
+from app.services.extract_pool import get_extraction_pool, get_full_text_pool
+from app.services.extraction import EXTRACTOR_VERSION, extract_metadata
+from app.services.search import index_documents, reindex_bodies
 
-async def ingest_files(files: Iterable[UploadFile]) -> List[Dict[str, object]]:
-    log.info("ingest_start")
-    results: List[Dict[str, object]] = []
-    count = 0
-    for f in files:
-        count += 1
-        try:
-            log.info(
-                "ingest_file_begin",
-                filename=f.filename,
-                content_type=getattr(f, "content_type", None),
-                declared_size=getattr(f, "size", None),
-                max_mb=settings.MAX_UPLOAD_MB,
+
+def enqueue_job(saved: List[Dict[str, Any]]) -> int:
+    """Persist a job for files already written to disk. Returns the job id."""
+    with get_session() as session:
+        job = IngestJob()
+        session.add(job)
+        session.flush()
+        for s in saved:
+            session.add(IngestJobFile(
+                job_id=job.id,
+                path=str(s["path"]),
+                original_name=s["original_name"],
+                content_type=s["content_type"],
+                size_bytes=s["size_bytes"],
+                content_hash=s.get("sha256"),
+            ))
+        session.commit()
+        log.info("ingest_job_enqueued", job_id=job.id, files=len(saved))
+        return job.id
+
+
+def _backoff(attempts: int) -> timedelta:
+    delay = settings.INGEST_RETRY_BACKOFF_S * (2 ** max(0, attempts - 1))
+    return timedelta(seconds=min(delay, settings.INGEST_RETRY_BACKOFF_MAX_S))
+
+
+def claim_job() -> Optional[int]:
+    """Atomically take the oldest runnable job (due, or orphaned by an expired lease)."""
+    now = datetime.utcnow()
+    runnable = or_(
+        and_(IngestJob.status == QUEUED, IngestJob.next_attempt_at <= now),
+        and_(IngestJob.status == RUNNING, IngestJob.lease_until < now),
+    )
+    with get_session() as session:
+        candidate = session.exec(select(IngestJob.id).where(runnable).order_by(IngestJob.id).limit(1)).first()
+        if candidate is None:
+            return None
+        res = session.exec(
+            update(IngestJob)
+            .where(IngestJob.id == candidate, runnable)
+            .values(
+                status=RUNNING,
+                attempts=IngestJob.attempts + 1,
+                lease_until=now + timedelta(seconds=settings.INGEST_LEASE_S),
+                updated_at=now,
             )
+        )
+        session.commit()
+        # another worker may have claimed it between the select and the update
+        return candidate if res.rowcount == 1 else None
 
-            if getattr(f, "size", None) and f.size > settings.MAX_UPLOAD_MB * 1024 * 1024:
-                log.warn("ingest_file_rejected_size", filename=f.filename, size=f.size)
-                raise ValueError(f"{f.filename} exceeds {settings.MAX_UPLOAD_MB}MB limit")
-
-            # Persist file to disk (dev) — in prod, switch to S3 based on STORAGE_BACKEND
-            dest = os.path.join(settings.DATA_DIR, f.filename)
-            with open(dest, "wb") as out:
-                content = await f.read()
-                out.write(content)
-            log.info("ingest_file_write_done", filename=f.filename, path=dest, bytes=len(content))
-
-            ctype = f.content_type or "application/octet-stream"
-            log.debug("ingest_extract_start", filename=f.filename, content_type=ctype)
-            text = extract_text_from_file(dest, ctype)
-            log.debug("ingest_extract_done", filename=f.filename, text_len=len(text) if text else 0)
-
-            md = extract_metadata(text)
-            log.info("ingest_metadata_extracted", filename=f.filename, **{k: v for k, v in md.items() if v})
-
-            record = {
-                "filename": f.filename,
-                "content_type": f.content_type,
-                "size_bytes": len(content),
-                "text": text,
-                **md,
-            }
-            results.append(record)
-            log.info("ingest_file_appended", filename=f.filename)
+
+def _renew_lease(job_id: int) -> None:
+    with get_session() as session:
+        session.exec(
+            update(IngestJob)
+            .where(IngestJob.id == job_id, IngestJob.status == RUNNING)
+            .values(lease_until=datetime.utcnow() + timedelta(seconds=settings.INGEST_LEASE_S))
+        )
+        session.commit()
+
+
+class _Heartbeat:
+    """Renews a job's lease in the background while it is being processed."""
+
+    def __init__(self, job_id: int) -> None:
+        self.job_id = job_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"ingest-lease-{job_id}", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(settings.INGEST_LEASE_S / 3):
+            try:
+                _renew_lease(self.job_id)
+            except Exception as e:
+                log.error("ingest_lease_renew_failed", job_id=self.job_id, error=str(e))
+
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def _cached_extraction(session: Session, content_hash: Optional[str]) -> Optional[Document]:
+    """The stored document for identical bytes parsed by the current extractor, if any."""
+    if not content_hash:
+        return None
+    stmt = select(Document).where(
+        Document.content_hash == content_hash,
+        Document.extractor_version == EXTRACTOR_VERSION,
+        Document.duplicate_of == None,  # noqa: E711
+    ).limit(1)
+    return session.exec(stmt).first()
+
+
+# (file, document to insert or None, extracted body or None, error or None)
+Outcome = Tuple[IngestJobFile, Optional[Document], Optional[str], Optional[str]]
+
+_UPDATE_FILE = (
+    update(IngestJobFile.__table__)
+    .where(IngestJobFile.__table__.c.id == bindparam("b_id"))
+    .values(
+        status=bindparam("b_status"),
+        attempts=bindparam("b_attempts"),
+        error=bindparam("b_error"),
+        document_id=bindparam("b_document_id"),
+    )
+)
+
+
+def _chunks(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for i in range(0, len(items), max(1, size)):
+        yield items[i:i + size]
+
+
+def _insert_documents(session: Session, docs: List[Document], texts: List[Optional[str]]) -> None:
+    """Bulk-insert the chunk (executemany) and its bodies, plus index/counter upkeep."""
+    table = Document.__table__
+    rows = [d.model_dump(exclude={"id"}) for d in docs]
+    if session.get_bind().dialect.name == "sqlite":
+        # RETURNING would force row-at-a-time inserts here. Inside our write
+        # transaction nothing else inserts, so the new rowids are contiguous.
+        session.exec(insert(table), params=rows)
+        last = session.exec(text("SELECT last_insert_rowid()")).scalar_one()
+        ids = range(last - len(rows) + 1, last + 1)
+    else:
+        ids = session.exec(insert(table).returning(table.c.id, sort_by_parameter_order=True), params=rows).scalars()
+    for d, doc_id in zip(docs, ids):
+        d.id = doc_id
+    bodies = {d.id: t for d, t in zip(docs, texts) if t is not None}
+    store_bodies(session, bodies)
+    index_documents(session, docs, bodies)
+    bump_facet_counts(session, docs)
+    bump_corpus_version(session)
+
+
+def _record_outcomes(session: Session, outcomes: List[Outcome]) -> List[dict]:
+    """Write the files' new status rows. The IngestJobFile objects are left
+    untouched (see _apply_outcomes) so a rolled-back write leaves no trace."""
+    params = []
+    for f, doc, _, error in outcomes:
+        if error is None:
+            params.append({"b_id": f.id, "b_status": DONE, "b_attempts": f.attempts,
+                           "b_error": None, "b_document_id": doc.id})
+        else:
+            attempts = f.attempts + 1
+            params.append({"b_id": f.id, "b_status": FAILED if attempts >= settings.INGEST_MAX_ATTEMPTS else QUEUED,
+                           "b_attempts": attempts, "b_error": error[:500], "b_document_id": None})
+    if params:
+        session.exec(_UPDATE_FILE, params=params)
+    return params
+
+
+def _apply_outcomes(outcomes: List[Outcome], params: List[dict]) -> None:
+    """Mirror committed status rows onto the IngestJobFile objects."""
+    for (f, _, _, error), p in zip(outcomes, params):
+        f.status, f.attempts, f.error, f.document_id = p["b_status"], p["b_attempts"], p["b_error"], p["b_document_id"]
+        if error is not None:
+            log.error("ingest_file_error", file_id=f.id, filename=f.original_name, error=error, attempts=f.attempts)
+
+
+def _file_outcome(f: IngestJobFile, doc: Optional[Document]) -> str:
+    if doc is None:
+        return "failed" if f.status == FAILED else "retry"
+    return "reused" if doc.duplicate_of else "extracted"
+
+
+def _write_chunk(outcomes: List[Outcome]) -> int:
+    """Commit a chunk's documents and file outcomes in one short transaction.
+
+    If the chunk fails, its files are retried one per transaction so a single
+    bad row fails alone. Returns the number of documents written.
+    """
+    written = [(doc, body) for _, doc, body, error in outcomes if error is None]
+    docs = [doc for doc, _ in written]
+    try:
+        with DB_COMMIT_SECONDS.time(), get_session() as session:
+            if docs:
+                _insert_documents(session, docs, [body for _, body in written])
+            params = _record_outcomes(session, outcomes)
+            session.commit()
+        _apply_outcomes(outcomes, params)
+        DOCUMENTS.inc(len(docs))
+        for f, doc, _, _ in outcomes:
+            FILES.labels(outcome=_file_outcome(f, doc)).inc()
+        return len(docs)
+    except Exception as e:
+        for d in docs:
+            d.id = None  # rolled back
+        if len(outcomes) == 1:
+            f = outcomes[0][0]
+            failed: List[Outcome] = [(f, None, None, f"{type(e).__name__}: {e}")]
+            with get_session() as session:
+                params = _record_outcomes(session, failed)
+                session.commit()
+            _apply_outcomes(failed, params)
+            FILES.labels(outcome=_file_outcome(f, None)).inc()
+            return 0
+        log.warn("ingest_chunk_failed", files=len(outcomes), error=str(e))
+        return sum(_write_chunk([o]) for o in outcomes)
+
+
+def _new_document(f: IngestJobFile, text: str, metadata: Optional[dict] = None) -> Document:
+    md = metadata  # already classified while a PDF was streamed
+    if md is None:
+        with EXTRACT_METADATA_SECONDS.time():
+            md = extract_metadata(text)  # agreement_type / governing_law / geography / industry
+    return Document(
+        filename=f.original_name,
+        content_type=f.content_type,
+        size_bytes=f.size_bytes,
+        content_hash=f.content_hash,
+        extractor_version=EXTRACTOR_VERSION,
+        agreement_type=md.get("agreement_type"),
+        governing_law=md.get("governing_law"),
+        geography=md.get("geography"),
+        industry=md.get("industry"),
+    )
+
+
+def _reference_document(f: IngestJobFile, original: Document) -> Document:
+    return Document(
+        filename=f.original_name,
+        content_type=f.content_type,
+        size_bytes=f.size_bytes,
+        content_hash=original.content_hash,
+        extractor_version=original.extractor_version,
+        duplicate_of=original.id,
+        agreement_type=original.agreement_type,
+        governing_law=original.governing_law,
+        geography=original.geography,
+        industry=original.industry,
+    )
+
+
+# (file, document, text stored so far) for PDFs read only in part
+Partial = Tuple[IngestJobFile, Document, str]
+
+
+def _ingest_files(files: List[IngestJobFile]) -> Tuple[int, List[Partial]]:
+    """Extract, classify and store `files` in chunks of INGEST_BATCH_SIZE.
+
+    No transaction is open while files are parsed; each chunk is written in
+    its own short one. Returns the number of documents written, and the
+    documents whose stored text is partial (budgeted PDF reads) when
+    PDF_DEFERRED_FULL_TEXT asks for a second pass.
+    """
+    # Identical bytes are parsed at most once: reuse a stored extraction,
+    # or the first copy in this job, and add cheap reference rows.
+    originals: Dict[str, Optional[Document]] = {}
+    to_extract: List[IngestJobFile] = []
+    copies: List[IngestJobFile] = []
+    with get_read_session() as session:
+        for f in files:
+            h = f.content_hash or ""
+            if h and h in originals:
+                copies.append(f)
+                continue
+            cached = _cached_extraction(session, h)
+            if cached is not None:
+                originals[h] = cached
+                copies.append(f)
+            else:
+                originals[h] = None
+                to_extract.append(f)
+    log.info("ingest_dedupe", extract=len(to_extract), reused=len(copies))
+
+    written = 0
+    partial: List[Partial] = []
+    batch = settings.INGEST_BATCH_SIZE
+    pool = get_extraction_pool()
+    for chunk in _chunks(to_extract, batch):
+        outcomes: List[Outcome] = []
+        for f, res in zip(chunk, pool.extract_many([(f.path, f.content_type) for f in chunk])):
+            log.debug("ingest_process_file", filename=f.original_name, path=f.path)
+            if res.error is not None:
+                outcomes.append((f, None, None, res.error))
+                continue
+            doc = _new_document(f, res.text, res.metadata)
+            outcomes.append((f, doc, res.text, None))
+            if not res.complete and settings.PDF_DEFERRED_FULL_TEXT:
+                partial.append((f, doc, res.text))
+            if doc.content_hash:
+                originals[doc.content_hash] = doc
+        written += _write_chunk(outcomes)
+
+    for chunk in _chunks(copies, batch):
+        outcomes = []
+        for f in chunk:
+            original = originals.get(f.content_hash or "")
+            if original is None or original.id is None:  # the first copy failed this time
+                outcomes.append((f, None, None, "identical file failed to ingest"))
+                continue
+            log.debug("ingest_reuse_extraction", filename=f.original_name, original_id=original.id)
+            outcomes.append((f, _reference_document(f, original), None, None))
+        written += _write_chunk(outcomes)
+    return written, [p for p in partial if p[1].id is not None]
+
+
+def _complete_bodies(partial: List[Partial]) -> None:
+    """Second pass for PDFs classified from their first pages: store and index the full text.
+
+    Runs after the job is marked done, on its own low-priority pool (see
+    get_full_text_pool). Metadata stays as classified. If the full parse
+    fails (or outlasts PDF_FULL_TEXT_TIMEOUT_S) the partial text is kept.
+    """
+    pool = get_full_text_pool()
+    for chunk in _chunks(partial, settings.INGEST_BATCH_SIZE):
+        results = pool.extract_many([(f.path, f.content_type) for f, _, _ in chunk])
+        full = {doc.id: res.text for (_, doc, _), res in zip(chunk, results) if res.error is None}
+        for (f, _, _), res in zip(chunk, results):
+            if res.error is not None:
+                log.warn("ingest_full_text_failed", filename=f.original_name, error=res.error)
+        if not full:
+            continue
+        with get_session() as session:
+            replace_bodies(session, full)
+            reindex_bodies(
+                session,
+                [doc for _, doc, _ in chunk if doc.id in full],
+                {doc.id: text for _, doc, text in chunk},
+                full,
+            )
+            bump_corpus_version(session)
+            session.commit()
+        log.info("ingest_full_text_stored", documents=len(full))
+
+
+def process_job(job_id: int) -> None:
+    """Run one claimed job; each chunk's documents and file outcomes commit together."""
+    log.info("ingest_job_start", job_id=job_id)
+    started = time.monotonic()
+    try:
+        with _Heartbeat(job_id):
+            with get_session() as session:
+                files = list(session.exec(
+                    select(IngestJobFile).where(IngestJobFile.job_id == job_id, IngestJobFile.status == QUEUED)
+                ))
+            written, partial = _ingest_files(files)
+
+            with get_session() as session:
+                job = session.get(IngestJob, job_id)
+                retry = [f for f in files if f.status == QUEUED]
+                now = datetime.utcnow()
+                if retry and job.attempts < settings.INGEST_MAX_ATTEMPTS:
+                    job.status, job.next_attempt_at = QUEUED, now + _backoff(job.attempts)
+                else:
+                    if retry:
+                        session.exec(
+                            update(IngestJobFile)
+                            .where(IngestJobFile.id.in_([f.id for f in retry]))
+                            .values(status=FAILED)
+                        )
+                    job.status = DONE
+                job.lease_until, job.updated_at = None, now
+                session.commit()
+                elapsed = time.monotonic() - started
+                log.info("ingest_job_committed", job_id=job_id, documents=written, retry=len(retry), status=job.status,
+                         seconds=round(elapsed, 3), docs_per_s=round(written / elapsed, 1) if elapsed else None)
+    except Exception as e:
+        log.error("ingest_job_error", job_id=job_id, error=str(e))
+        with get_session() as session:
+            job = session.get(IngestJob, job_id)
+            if job is not None:
+                now = datetime.utcnow()
+                job.error = str(e)[:500]
+                job.status = FAILED if job.attempts >= settings.INGEST_MAX_ATTEMPTS else QUEUED
+                job.next_attempt_at, job.lease_until, job.updated_at = now + _backoff(job.attempts), None, now
+                if job.status == FAILED:
+                    session.exec(
+                        update(IngestJobFile)
+                        .where(IngestJobFile.job_id == job_id, IngestJobFile.status == QUEUED)
+                        .values(status=FAILED, error=str(e)[:500])
+                    )
+                session.commit()
+        return
+
+    if partial:
+        try:
+            _complete_bodies(partial)
         except Exception as e:
-            log.error("ingest_file_error", filename=getattr(f, "filename", None), error=str(e))
-            raise
+            log.error("ingest_full_text_error", job_id=job_id, error=str(e))
+
+    # numpy-backed: imported here so API workers that never ingest don't load numpy.
+    # The facet index is not synced here: /dashboard/facets tops it up on demand.
+    from app.services.retrieval import get_retrieval_index
+
+    try:
+        with get_read_session() as session:
+            get_retrieval_index().sync(session)
+    except Exception as e:
+        # the index tops itself up on the next QA request
+        log.error("retrieval_index_update_failed", error=str(e))
+
+
+def observe_queue_depth() -> None:
+    """Publish queued work (jobs not finished, files still to process) to the gauge."""
+    pending = IngestJob.status.in_([QUEUED, RUNNING])
+    with get_read_session() as session:
+        jobs = session.exec(select(func.count()).select_from(IngestJob).where(pending)).one()
+        files = session.exec(
+            select(func.count())
+            .select_from(IngestJobFile)
+            .join(IngestJob, IngestJob.id == IngestJobFile.job_id)
+            .where(pending, IngestJobFile.status == QUEUED)
+        ).one()
+    QUEUE_DEPTH.labels(unit="jobs").set(jobs)
+    QUEUE_DEPTH.labels(unit="files").set(files)
+
+
+def job_status(session: Session, job_id: int) -> Optional[Dict[str, Any]]:
+    job = session.get(IngestJob, job_id)
+    if job is None:
+        return None
+    files = list(session.exec(
+        select(IngestJobFile).where(IngestJobFile.job_id == job_id).order_by(IngestJobFile.id)
+    ))
+    progress = {"total": len(files), DONE: 0, FAILED: 0, QUEUED: 0}
+    for f in files:
+        progress[f.status] = progress.get(f.status, 0) + 1
+    return {
+        "id": job.id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "progress": progress,
+        "files": [
+            {
+                "filename": f.original_name,
+                "status": f.status,
+                "attempts": f.attempts,
+                "error": f.error,
+                "document_id": f.document_id,
+                "size_bytes": f.size_bytes,
+            }
+            for f in files
+        ],
+    }
+
+
+class IngestQueue:
+    """Bounded pool of worker threads draining the ingestion job table."""
+
+    def __init__(self, concurrency: int, poll_interval_s: float) -> None:
+        self.concurrency = concurrency
+        self.poll_interval_s = poll_interval_s
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            # threads do not survive fork: a forked worker starts its own
+            if self._pid == os.getpid() and self._threads:
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f"ingest-worker-{i}", daemon=True)
+                for i in range(self.concurrency)
+            ]
+            for t in self._threads:
+                t.start()
+            log.info("ingest_queue_started", workers=self.concurrency)
+
+    def notify(self) -> None:
+        self.start()
+        self._wake.set()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        with self._lock:
+            self._stop.set()
+            self._wake.set()
+            for t in self._threads:
+                t.join(timeout)
+            self._threads = []
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                observe_queue_depth()
+                job_id = claim_job()
+            except Exception as e:
+                log.error("ingest_claim_failed", error=str(e))
+                job_id = None
+            if job_id is not None:
+                process_job(job_id)
+                continue
+            self._wake.wait(self.poll_interval_s)
+            self._wake.clear()
+
+
+_queue: Optional[IngestQueue] = None
+_queue_lock = threading.Lock()
+
 
-    log.info("ingest_end", files_processed=count, results=len(results))
-    return results
+def get_ingest_queue() -> IngestQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = IngestQueue(settings.INGEST_CONCURRENCY, settings.INGEST_POLL_INTERVAL_S)
+        return _queue
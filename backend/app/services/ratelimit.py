@@ -0,0 +1,150 @@
+"""
+Token-bucket rate limiting.
+
+Each client key gets a bucket of `burst` tokens refilled at `rate` tokens
+per second; a request spends one. Buckets are O(1) to check and update.
+A bucket idle long enough to have refilled completely is indistinguishable
+from a new one, so it can be dropped without changing any decision; that
+keeps memory bounded by the number of recently active clients.
+
+Two backends:
+  - MemoryRateLimiter: per process; LRU-ordered, evicts idle buckets and
+    caps the key count.
+  - SQLiteRateLimiter: buckets in a small SQLite file shared by every worker
+    process on the host, updated with one atomic UPSERT per request. It runs
+    on the event loop, so it waits at most a few milliseconds for a lock held
+    by another worker and otherwise lets the request through (fails open).
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import log
+
+
+class MemoryRateLimiter:
+    def __init__(self, rate: float, burst: int, max_keys: int = 100_000, clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.idle_s = burst / rate  # time for an empty bucket to refill
+        self._clock = clock
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: str) -> float:
+        """Spend a token for `key`. Returns 0 if allowed, else seconds until one is available."""
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1.0:
+                tokens -= 1.0
+            else:
+                wait = (1.0 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)  # most recently used last
+            self._evict(now)
+            return wait
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            key, (_, updated) = next(iter(buckets.items()))
+            if len(buckets) <= self.max_keys and now - updated < self.idle_s:
+                break
+            del buckets[key]
+
+
+_UPSERT = """
+INSERT INTO buckets (key, tokens, updated) VALUES (:key, :burst - 1, :now)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = min(:burst, tokens + (:now - updated) * :rate) - 1,
+    updated = :now
+WHERE min(:burst, tokens + (:now - updated) * :rate) >= 1
+RETURNING tokens
+"""
+_PEEK = "SELECT min(:burst, tokens + (:now - updated) * :rate) FROM buckets WHERE key = :key"
+
+
+class SQLiteRateLimiter:
+    """Buckets in a SQLite file so every worker process on the host shares one limit.
+
+    acquire() is a blocking call made on the event loop: `busy_timeout_s`
+    bounds how long it can stall the worker when another process holds the
+    write lock. Past that, or on any other SQLite error, the request is allowed.
+    """
+
+    def __init__(
+        self, path: Path, rate: float, burst: int, prune_every: int = 1000, busy_timeout_s: float = 0.005,
+    ) -> None:
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.idle_s = burst / rate
+        self.prune_every = prune_every
+        self.busy_timeout_s = busy_timeout_s
+        self._last_error_log = 0.0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # connections must not cross fork(); each worker opens its own
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_s, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = OFF")  # losing buckets on a crash is harmless
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_buckets_updated ON buckets (updated)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def acquire(self, key: str) -> float:
+        now = time.time()  # wall clock: shared between processes
+        params = {"key": key, "burst": float(self.burst), "rate": self.rate, "now": now}
+        with self._lock:
+            try:
+                conn = self._connect()
+                if conn.execute(_UPSERT, params).fetchone() is not None:
+                    wait = 0.0
+                else:
+                    tokens = conn.execute(_PEEK, params).fetchone()[0]
+                    wait = max(0.0, (1.0 - tokens) / self.rate)
+                self._calls += 1
+                if self._calls % self.prune_every == 0:
+                    conn.execute("DELETE FROM buckets WHERE updated < ?", (now - self.idle_s,))
+                return wait
+            except sqlite3.Error as e:
+                # a busy or broken bucket file must not turn valid requests into 500s
+                if now - self._last_error_log >= 1.0:  # at most one line a second under contention
+                    self._last_error_log = now
+                    log.warn("rate_limit_backend_error", error=str(e), path=str(self.path))
+                return 0.0
+
+
+def build_rate_limiter(window_s: int, max_requests: int):
+    """Limiter allowing `max_requests` per `window_s` on average, with bursts up to `max_requests`."""
+    rate = max_requests / window_s
+    if settings.RATE_LIMIT_BACKEND == "sqlite":
+        path = Path(settings.RATE_LIMIT_SQLITE_PATH or Path(settings.DATA_DIR) / "ratelimit.db")
+        log.info("rate_limiter", backend="sqlite", path=str(path))
+        return SQLiteRateLimiter(path, rate, max_requests, busy_timeout_s=settings.RATE_LIMIT_SQLITE_BUSY_TIMEOUT_MS / 1000)
+    return MemoryRateLimiter(rate, max_requests, max_keys=settings.RATE_LIMIT_MAX_KEYS)
+
+
+def retry_after(wait: float) -> str:
+    return str(max(1, math.ceil(wait)))
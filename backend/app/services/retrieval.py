@@ -0,0 +1,249 @@
+"""
+Hashed TF-IDF retrieval index for the QA retriever.
+
+Documents are vectorized once into sparse, L2-normalised sublinear-tf rows
+over a fixed hashed vocabulary. Queries are weighted by the
+current IDF, so new documents never force old rows to be re-weighted.
+Scoring walks term-sorted postings, touching only rows that share a term
+with the question; postings are kept in merged segments so adding
+documents sorts only the new ones. The index is persisted with np.savez
+and topped up from the DB (ids above the last indexed one) instead of
+being rebuilt.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.logging import log
+from app.models.document import Document
+from app.services.bodies import iter_bodies
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+SYNC_CHUNK = 500
+
+
+def _hashed_counts(text: str, dim: int) -> Tuple[np.ndarray, np.ndarray]:
+    counts = Counter(_TOKEN_RE.findall(text.lower()))
+    if not counts:
+        return np.empty(0, np.int32), np.empty(0, np.float32)
+    dims = np.fromiter((zlib.crc32(t.encode("utf-8")) % dim for t in counts), np.int64, len(counts))
+    tf = np.fromiter(counts.values(), np.float32, len(counts))
+    # merge hash collisions
+    uniq, inv = np.unique(dims, return_inverse=True)
+    return uniq.astype(np.int32), np.bincount(inv, weights=tf).astype(np.float32)
+
+
+class _Segment(NamedTuple):
+    """Postings for a run of rows, sorted by hashed term."""
+    dims: np.ndarray  # int32 term, ascending
+    rows: np.ndarray  # int32 row number in the index
+    vals: np.ndarray  # float32 normalised weight
+
+
+def _segment(first_row: int, lengths: List[int], dims: np.ndarray, vals: np.ndarray) -> _Segment:
+    rows = np.repeat(np.arange(first_row, first_row + len(lengths), dtype=np.int32), lengths)
+    order = np.argsort(dims, kind="stable")
+    return _Segment(dims[order], rows[order], vals[order])
+
+
+def _merge(a: _Segment, b: _Segment) -> _Segment:
+    # two sorted runs: the stable (tim)sort merges them in linear time
+    dims = np.concatenate([a.dims, b.dims])
+    order = np.argsort(dims, kind="stable")
+    return _Segment(dims[order], np.concatenate([a.rows, b.rows])[order], np.concatenate([a.vals, b.vals])[order])
+
+
+class RetrievalIndex:
+    """
+    Postings live in a few term-sorted segments. Each add() sorts only the
+    new documents into a segment of their own, then merges it with the
+    segments before it while they are less than twice its size, so there
+    are O(log n) segments and each posting is re-merged O(log n) times.
+    A search looks its terms up in every segment; it never sorts.
+    """
+
+    def __init__(self, dim: int = 1 << 18, path: Optional[Path] = None) -> None:
+        self.dim = dim
+        self.path = path
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._ids = np.empty(1024, np.int64)  # row -> document id, grown by doubling
+            self._n = 0
+            self._last_id = 0
+            self.df = np.zeros(self.dim, np.int32)
+            self._segments: List[_Segment] = []
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def doc_ids(self) -> np.ndarray:
+        return self._ids[:self._n]
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def _append_ids(self, ids: np.ndarray) -> None:
+        need = self._n + len(ids)
+        if need > len(self._ids):
+            grown = np.empty(max(need, 2 * len(self._ids)), np.int64)
+            grown[:self._n] = self.doc_ids
+            self._ids = grown
+        self._ids[self._n:need] = ids
+        self._n = need
+        self._last_id = max(self._last_id, int(ids.max()))
+
+    def _add_segment(self, seg: _Segment) -> None:
+        segments = self._segments
+        segments.append(seg)
+        while len(segments) > 1 and len(segments[-2].dims) <= 2 * len(segments[-1].dims):
+            b = segments.pop()
+            segments.append(_merge(segments.pop(), b))
+
+    def add(self, docs: Iterable[Tuple[int, str]]) -> int:
+        """Index (document id, text) pairs; ids already present are skipped."""
+        with self._lock:
+            batch = {}
+            for doc_id, text in docs:
+                batch.setdefault(doc_id, text)
+            candidates = np.fromiter(batch, np.int64, len(batch))
+            # sync adds ids above last_id; only lower ones can already be indexed
+            known = candidates <= self._last_id
+            if known.any():
+                known[known] = np.isin(candidates[known], self.doc_ids)
+            ids, lengths, idx_parts, val_parts = [], [], [], []
+            for doc_id, is_known in zip(candidates.tolist(), known.tolist()):
+                if is_known:
+                    continue
+                dims, tf = _hashed_counts(batch[doc_id] or "", self.dim)
+                w = 1.0 + np.log(tf) if len(tf) else tf
+                norm = float(np.linalg.norm(w))
+                ids.append(doc_id)
+                lengths.append(len(dims))
+                idx_parts.append(dims)
+                val_parts.append(w / norm if norm else w)
+            if not ids:
+                return 0
+            new_dims = np.concatenate(idx_parts)
+            self.df += np.bincount(new_dims, minlength=self.dim).astype(np.int32)
+            self._add_segment(_segment(self._n, lengths, new_dims, np.concatenate(val_parts).astype(np.float32)))
+            self._append_ids(np.asarray(ids, np.int64))
+            return len(ids)
+
+    def search(self, question: str, top_k: int = 3) -> List[Tuple[int, float]]:
+        """Top-k (document id, cosine score) for the question, best first."""
+        with self._lock:
+            n = self._n
+            dims, tf = _hashed_counts(question, self.dim)
+            if not n or not len(dims):
+                return []
+            idf = np.log((1.0 + n) / (1.0 + self.df[dims])) + 1.0
+            qw = (1.0 + np.log(tf)) * idf
+            qw /= np.linalg.norm(qw)
+
+            rows, contributions = [], []
+            for seg in self._segments:
+                lo = np.searchsorted(seg.dims, dims, side="left")
+                hi = np.searchsorted(seg.dims, dims, side="right")
+                for a, b, w in zip(lo, hi, qw):
+                    if b > a:
+                        rows.append(seg.rows[a:b])
+                        contributions.append(seg.vals[a:b] * w)
+            if not rows:
+                return []
+            scores = np.bincount(np.concatenate(rows), weights=np.concatenate(contributions), minlength=n)
+
+            k = min(top_k, int(np.count_nonzero(scores)))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(int(self._ids[i]), float(scores[i])) for i in top]
+
+    def sync(self, session: Session) -> int:
+        """Index bodies stored after the last indexed id. Returns how many were added.
+
+        Identical copies have no body of their own and are not indexed.
+        """
+        added = 0
+        with self._lock:
+            db_max = session.exec(select(func.max(Document.id))).one() or 0
+            if db_max < self.last_id:
+                # the database was replaced under a persisted index
+                log.warn("retrieval_index_reset", indexed_max=self.last_id, db_max=db_max)
+                self.reset()
+            while True:
+                rows = iter_bodies(session, self.last_id, SYNC_CHUNK)
+                if not rows:
+                    break
+                added += self.add(rows)
+            if added:
+                log.info("retrieval_index_synced", added=added, documents=len(self))
+                self.save()
+        return added
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            segs = self._segments
+            with open(tmp, "wb") as f:
+                np.savez(
+                    f, dim=np.int64(self.dim), doc_ids=self.doc_ids, df=self.df,
+                    seg_sizes=np.asarray([len(sg.dims) for sg in segs], np.int64),
+                    dims=np.concatenate([sg.dims for sg in segs]) if segs else np.empty(0, np.int32),
+                    rows=np.concatenate([sg.rows for sg in segs]) if segs else np.empty(0, np.int32),
+                    vals=np.concatenate([sg.vals for sg in segs]) if segs else np.empty(0, np.float32),
+                )
+            os.replace(tmp, self.path)
+
+    @classmethod
+    def load(cls, path: Path, dim: int) -> "RetrievalIndex":
+        index = cls(dim=dim, path=path)
+        if not path.exists():
+            return index
+        try:
+            with np.load(path) as z:
+                if int(z["dim"]) != dim:
+                    log.warn("retrieval_index_dim_changed", path=str(path), stored=int(z["dim"]), dim=dim)
+                    return index
+                doc_ids, index.df = z["doc_ids"], z["df"]
+                bounds = np.cumsum(z["seg_sizes"])[:-1]
+                parts = [np.split(z[k], bounds) for k in ("dims", "rows", "vals")]
+                index._segments = [_Segment(*p) for p in zip(*parts)]
+            if len(doc_ids):
+                index._append_ids(doc_ids)
+        except Exception as e:
+            log.error("retrieval_index_load_failed", path=str(path), error=str(e))
+            return cls(dim=dim, path=path)
+        return index
+
+
+_index: Optional[RetrievalIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_retrieval_index() -> RetrievalIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            path = Path(settings.DATA_DIR) / settings.RETRIEVAL_INDEX_FILE
+            _index = RetrievalIndex.load(path, dim=1 << settings.RETRIEVAL_INDEX_BITS)
+        return _index
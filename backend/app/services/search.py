@@ -0,0 +1,144 @@
+"""
+Full-text index over documents (SQLite FTS5).
+
+The index is contentless: it stores only the inverted index and hands back
+rowids (== Document.id), so document bodies are not duplicated on disk.
+Rows are written by ingestion in the same transaction as the documents.
+Bodies are indexed for original documents only; identical copies match
+on their own filename and metadata.
+"""
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+from app.models.document import Document
+from app.services.bodies import load_bodies
+
+FTS_TABLE = "document_fts"
+FTS_COLUMNS = ("filename", "text", "agreement_type", "governing_law", "geography", "industry")
+# bm25 column weights, same order as FTS_COLUMNS: metadata hits outrank body hits
+FTS_WEIGHTS = (4.0, 1.0, 3.0, 3.0, 3.0, 3.0)
+REBUILD_CHUNK = 500
+
+
+def fts_available(session: Session) -> bool:
+    return session.get_bind().dialect.name == "sqlite"
+
+
+def ensure_fts(session: Session) -> None:
+    """Create the FTS table if missing and index whatever is already stored."""
+    if not fts_available(session):
+        return
+    exists = session.exec(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name").bindparams(name=FTS_TABLE)
+    ).first()
+    if exists:
+        return
+    session.exec(text(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({', '.join(FTS_COLUMNS)}, "
+        "content='', tokenize='porter unicode61')"
+    ))
+    last_id = 0
+    while True:
+        docs = list(session.exec(
+            select(Document).where(Document.id > last_id).order_by(Document.id).limit(REBUILD_CHUNK)
+        ))
+        if not docs:
+            break
+        index_documents(session, docs, load_bodies(session, [d for d in docs if d.duplicate_of is None]))
+        last_id = docs[-1].id
+    session.commit()
+
+
+_COLS = ", ".join(FTS_COLUMNS)
+_PARAMS = ", ".join(f":{c}" for c in FTS_COLUMNS)
+
+
+def _fts_rows(docs: Iterable[Document], bodies: Mapping[int, str]) -> List[Dict[str, object]]:
+    return [
+        {"rowid": d.id, "text": bodies.get(d.id) or "",
+         **{c: getattr(d, c) or "" for c in FTS_COLUMNS if c != "text"}}
+        for d in docs
+    ]
+
+
+def index_documents(session: Session, docs: Iterable[Document], bodies: Mapping[int, str] = {}) -> None:
+    """Add documents to the index. They must already be flushed (have ids);
+    `bodies` maps document id to text."""
+    if not fts_available(session):
+        return
+    rows = _fts_rows(docs, bodies)
+    if rows:
+        session.exec(text(f"INSERT INTO {FTS_TABLE} (rowid, {_COLS}) VALUES (:rowid, {_PARAMS})"), params=rows)
+
+
+def reindex_bodies(session: Session, docs: Iterable[Document], old: Mapping[int, str], new: Mapping[int, str]) -> None:
+    """Swap the indexed body of each document from `old` to `new` text.
+
+    The index is contentless, so removing a row means replaying the values
+    it was indexed with.
+    """
+    if not fts_available(session):
+        return
+    docs = list(docs)
+    rows = _fts_rows(docs, old)
+    if rows:
+        session.exec(
+            text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {_COLS}) VALUES ('delete', :rowid, {_PARAMS})"),
+            params=rows,
+        )
+        index_documents(session, docs, new)
+
+
+def quote_term(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def any_term(terms: Sequence[str]) -> str:
+    return " OR ".join(quote_term(t) for t in terms)
+
+
+def column_phrase(column: str, phrase: str) -> str:
+    return f"{column} : {quote_term(phrase)}"
+
+
+def column_any(column: str, phrases: Sequence[str]) -> str:
+    """Match any of `phrases` in one column."""
+    return f"{column} : ({any_term(phrases)})"
+
+
+def search_ids(session: Session, match: str, limit: int) -> List[int]:
+    """Document ids matching an FTS5 query expression, best bm25 rank first."""
+    weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+    stmt = text(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match "
+        f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT :limit"
+    ).bindparams(match=match, limit=limit)
+    return [row[0] for row in session.exec(stmt)]
+
+
+def has_match(session: Session, match: str) -> bool:
+    """Whether anything matches an FTS5 query expression (unranked: stops at the first hit)."""
+    stmt = text(f"SELECT 1 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match LIMIT 1").bindparams(match=match)
+    return session.exec(stmt).first() is not None
+
+
+def recent_ids(session: Session, match: str, limit: int, before: Optional[int] = None) -> List[int]:
+    """Ids matching an FTS5 query expression, highest (newest) first, below `before` if given.
+
+    Read in the index's own rowid order, so a page costs O(limit) however
+    many documents match: nothing is ranked or sorted.
+    """
+    below = f"AND rowid < :before " if before is not None else ""
+    stmt = text(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match {below}ORDER BY rowid DESC LIMIT :limit"
+    ).bindparams(match=match, limit=limit, **({"before": before} if before is not None else {}))
+    return [row[0] for row in session.exec(stmt)]
+
+
+def fetch_ranked(session: Session, ids: Sequence[int]) -> List[Document]:
+    if not ids:
+        return []
+    by_id = {d.id: d for d in session.exec(select(Document).where(Document.id.in_(ids)))}
+    return [by_id[i] for i in ids if i in by_id]
@@ -1,11 +1,46 @@
-from pdfminer.high_level import extract_text as pdf_extract_text
-from docx import Document
+"""
+Text extraction from uploaded files.
+
+The parsers (pdfminer, python-docx) are imported on first use: API workers
+that only serve queries never load them, and with the extraction pool
+enabled they are only loaded in the pool's worker processes.
+"""
+from io import StringIO
+from typing import Iterator, Tuple
 import os
 
 def extract_text_from_pdf(path: str) -> str:
+    from pdfminer.high_level import extract_text as pdf_extract_text
+
     return pdf_extract_text(path) or ""
 
+def iter_pdf_pages(path: str) -> Iterator[Tuple[str, bool]]:
+    """(text, is_last) for each page in turn, laid out one page at a time.
+
+    The pages joined are what extract_text_from_pdf returns; stopping early
+    skips the layout work for the rest of the file.
+    """
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+
+    rsrcmgr = PDFResourceManager(caching=True)
+    laparams = LAParams()
+    with open(path, "rb") as fp:
+        pages = PDFPage.get_pages(fp, caching=True)
+        page = next(pages, None)
+        while page is not None:
+            out = StringIO()
+            device = TextConverter(rsrcmgr, out, laparams=laparams)
+            PDFPageInterpreter(rsrcmgr, device).process_page(page)
+            device.close()
+            page = next(pages, None)  # page objects are cheap; the layout above is the cost
+            yield out.getvalue(), page is None
+
 def extract_text_from_docx(path: str) -> str:
+    from docx import Document
+
     doc = Document(path)
     return "\n".join(p.text for p in doc.paragraphs)
 
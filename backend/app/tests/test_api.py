@@ -11,6 +11,20 @@ from app.db import init_db
 def _ensure_db():
     init_db()
 
+
+async def _upload_and_wait(ac, files):
+    """Upload, then poll the ingestion job until it finishes."""
+    ur = await ac.post(f"{settings.API_PREFIX}/upload", files=files)
+    assert ur.status_code == 200
+    job_id = ur.json()["job_id"]
+    for _ in range(100):  # up to ~10s
+        jr = await ac.get(f"{settings.API_PREFIX}/upload/jobs/{job_id}")
+        assert jr.status_code == 200
+        if jr.json()["status"] in ("done", "failed"):
+            return jr.json()
+        await asyncio.sleep(0.1)
+    raise AssertionError(f"ingestion job {job_id} did not finish")
+
 @pytest.mark.asyncio
 async def test_health():
     async with AsyncClient(app=app, base_url="http://test") as ac:
@@ -97,3 +111,362 @@ async def test_upload_then_query_documents():
             await asyncio.sleep(0.1)
 
         assert found, "Uploaded document should be retrievable via governing law filter"
+
+
+@pytest.mark.asyncio
+async def test_dashboard_counts_follow_uploads():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        before = (await ac.get(f"{settings.API_PREFIX}/dashboard")).json()
+        content = b"This MSA for the Healthcare sector is governed by UK law."
+        files = [("files", ("sample_uk_msa.txt", content, "text/plain"))]
+        await _upload_and_wait(ac, files)
+
+        after = (await ac.get(f"{settings.API_PREFIX}/dashboard")).json()
+        assert after["count_documents"] == before["count_documents"] + 1
+        assert after["agreement_types"].get("MSA", 0) == before["agreement_types"].get("MSA", 0) + 1
+        assert after["industries"].get("Healthcare", 0) == before["industries"].get("Healthcare", 0) + 1
+        assert sum(after["geographies"].values()) == after["count_documents"]
+
+
+@pytest.mark.asyncio
+async def test_dashboard_facets_filter_and_cross_tab():
+    url = f"{settings.API_PREFIX}/dashboard/facets"
+    params = {"agreement_type": "Franchise Agreement", "governing_law": "KSA", "cross": "industry,geography"}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        before = (await ac.get(url, params=params)).json()
+        files = [("files", (f"facet_{i}.txt", f"Franchise Agreement {i} governed by KSA law, Retail in the GCC".encode(), "text/plain"))
+                 for i in range(2)]
+        await _upload_and_wait(ac, files)
+        after = (await ac.get(url, params=params)).json()
+        bad = await ac.get(url, params={"cross": "industry"})
+
+    assert after["count_documents"] == before["count_documents"] + 2
+    assert after["industries"].get("Retail", 0) == before["industries"].get("Retail", 0) + 2
+    assert after["cross"]["counts"]["Retail"]["GCC"] >= 2
+    assert bad.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_dashboard_etag_revalidation():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        r = await ac.get(f"{settings.API_PREFIX}/dashboard")
+        etag = r.headers["etag"]
+        r304 = await ac.get(f"{settings.API_PREFIX}/dashboard", headers={"If-None-Match": etag})
+        assert r304.status_code == 304
+        assert r304.headers["etag"] == etag
+
+        # New documents bump the corpus version and so the ETag
+        files = [("files", ("sample_etag.txt", b"Supplier Agreement under Dubai law.", "text/plain"))]
+        await _upload_and_wait(ac, files)
+        r2 = await ac.get(f"{settings.API_PREFIX}/dashboard", headers={"If-None-Match": etag})
+        assert r2.status_code == 200
+        assert r2.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_dashboard_built_across_a_commit_is_not_cached(monkeypatch):
+    from app.api import dashboard
+    from app.db import get_session
+    from app.services.cache import bump_corpus_version, corpus_version, make_etag, response_cache
+
+    def bump():
+        with get_session() as session:
+            bump_corpus_version(session)
+            session.commit()
+            return corpus_version(session)
+
+    version = bump()  # nothing cached for this version yet
+    real_build = dashboard.build_dashboard
+
+    def build_during_commit(session):
+        bump()  # a chunk commits between the version read and the counts
+        return real_build(session)
+
+    monkeypatch.setattr(dashboard, "build_dashboard", build_during_commit)
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        r = await ac.get(f"{settings.API_PREFIX}/dashboard")
+    assert r.status_code == 200
+    assert "etag" not in r.headers
+    assert response_cache.get(make_etag(version, "dashboard")) is None
+
+
+@pytest.mark.asyncio
+async def test_query_matches_contract_body():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        content = b"The Supplier shall indemnify the Buyer against liquidated damages arising from late delivery."
+        files = [("files", ("supply_terms.txt", content, "text/plain"))]
+        await _upload_and_wait(ac, files)
+
+        r = await ac.get(f"{settings.API_PREFIX}/query/documents", params={"question": "liquidated damages clauses"})
+        assert r.status_code == 200
+        assert r.json()[0]["document"] == "supply_terms.txt"
+
+
+@pytest.mark.asyncio
+async def test_upload_size_enforced_while_streaming(monkeypatch, tmp_path):
+    from app.api import uploads
+
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_MB", 1)
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_BYTES", 64 * 1024)
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", tmp_path / "uploads")  # created by the upload itself
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        files = [
+            ("files", ("small.txt", b"Healthcare NDA", "text/plain")),
+            ("files", ("huge.txt", b"x" * (1024 * 1024 + 1), "text/plain")),
+        ]
+        r = await ac.post(f"{settings.API_PREFIX}/upload", files=files)
+        assert r.status_code == 413
+    assert list(uploads.UPLOAD_DIR.iterdir()) == []  # the small file was removed too
+
+
+@pytest.mark.asyncio
+async def test_upload_answers_503_while_the_writer_is_busy(monkeypatch, tmp_path):
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+    from app.api import uploads
+
+    def busy(saved):
+        raise PoolTimeoutError("QueuePool limit of size 1 overflow 0 reached")
+
+    monkeypatch.setattr(uploads, "enqueue_job", busy)
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", tmp_path / "uploads")
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        files = [("files", ("busy.txt", b"Healthcare NDA", "text/plain"))]
+        r = await ac.post(f"{settings.API_PREFIX}/upload", files=files)
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "5"
+    assert list(uploads.UPLOAD_DIR.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_identical_upload_reuses_extraction(monkeypatch):
+    from sqlmodel import select
+    from app.services import ingestion
+    from app.db import get_session
+    from app.models.document import Document, DocumentBody
+    from app.services.bodies import load_bodies
+
+    calls = []
+    real_extract = ingestion.extract_metadata
+    monkeypatch.setattr(ingestion, "extract_metadata", lambda text: calls.append(text) or real_extract(text))
+
+    content = b"Franchise Agreement for a Retail chain in Abu Dhabi."
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        for name in ("franchise_a.txt", "franchise_b.txt"):
+            files = [("files", (name, content, "text/plain")), ("files", (f"copy_{name}", content, "text/plain"))]
+            job = await _upload_and_wait(ac, files)
+            assert job["progress"]["done"] == 2
+
+    assert len(calls) == 1
+    with get_session() as s:
+        docs = list(s.exec(select(Document).where(Document.filename.like("%franchise_%")).order_by(Document.id)))
+        bodies = load_bodies(s, docs)
+        stored = s.exec(select(DocumentBody.document_id).where(DocumentBody.document_id.in_([d.id for d in docs]))).all()
+    assert len(docs) == 4
+    original = docs[0]
+    assert original.duplicate_of is None and stored == [original.id]
+    assert all(d.duplicate_of == original.id for d in docs[1:])
+    assert set(bodies.values()) == {content.decode()} and len(bodies) == 4
+    assert {d.agreement_type for d in docs} == {"Franchise Agreement"}
+
+
+@pytest.mark.asyncio
+async def test_streamed_pdf_is_classified_early_and_completed_later(monkeypatch):
+    from benchmarks.corpus import pdf_bytes
+    from app.services import ingestion
+    from app.services.extract_pool import ExtractionPool
+
+    # inline pool, so the patched settings apply to extraction too
+    monkeypatch.setattr(ingestion, "get_extraction_pool", lambda: ExtractionPool(workers=0, timeout_s=30))
+    monkeypatch.setattr(settings, "PDF_EXTRACT_MODE", "streaming")
+    monkeypatch.setattr(settings, "PDF_MAX_PAGES", 1)
+    filler = ["Either party may terminate on notice."] * 30
+    pdf = pdf_bytes(["Supplier Agreement governed by KSA law."] + filler + filler + ["Zanzibarclause appendix."])
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        job = await _upload_and_wait(ac, [("files", ("streamed_bundle.pdf", pdf, "application/pdf"))])
+        assert job["progress"]["done"] == 1
+        for _ in range(50):  # the full text is stored after the job is marked done
+            r = await ac.get(f"{settings.API_PREFIX}/query/documents", params={"question": "zanzibarclause"})
+            if r.json():
+                break
+            await asyncio.sleep(0.1)
+        assert r.json() == [{"document": "streamed_bundle.pdf", "governing_law": "KSA"}]
+
+
+@pytest.mark.asyncio
+async def test_upload_job_status_reports_files():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        files = [
+            ("files", ("job_a.txt", b"Employment Agreement, Technology, Europe", "text/plain")),
+            ("files", ("job_b.txt", b"Supplier Agreement governed by KSA law", "text/plain")),
+        ]
+        job = await _upload_and_wait(ac, files)
+        assert job["status"] == "done"
+        assert job["progress"] == {"total": 2, "done": 2, "failed": 0, "queued": 0}
+        assert [f["filename"] for f in job["files"]] == ["job_a.txt", "job_b.txt"]
+        assert all(f["document_id"] for f in job["files"])
+
+        assert (await ac.get(f"{settings.API_PREFIX}/upload/jobs/999999")).status_code == 404
+
+
+def test_orphaned_job_is_reclaimed_after_lease_expiry():
+    import time
+    from datetime import datetime, timedelta
+    from app.db import get_session
+    from app.models.job import IngestJob
+    from app.services.ingestion import claim_job, process_job
+
+    with get_session() as s:
+        # a job left "running" by a worker that died
+        job = IngestJob(status="running", attempts=1, lease_until=datetime.utcnow() - timedelta(seconds=1))
+        s.add(job)
+        s.commit()
+        job_id = job.id
+
+    # background workers may reclaim it before we do; either way it completes
+    claimed = claim_job()
+    if claimed is not None:
+        process_job(claimed)
+    for _ in range(50):
+        with get_session() as s:
+            job = s.get(IngestJob, job_id)
+        if job.status == "done":
+            break
+        time.sleep(0.1)
+    assert job.status == "done"
+    assert job.attempts == 2
+
+
+@pytest.mark.asyncio
+async def test_bad_row_fails_alone(monkeypatch):
+    from app.services import ingestion
+
+    real_index = ingestion.index_documents
+
+    def flaky_index(session, docs, bodies):
+        if any(d.filename == "poison.txt" for d in docs):
+            raise RuntimeError("index write failed")
+        return real_index(session, docs, bodies)
+
+    monkeypatch.setattr(ingestion, "index_documents", flaky_index)
+    monkeypatch.setattr(settings, "INGEST_MAX_ATTEMPTS", 1)
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        files = [
+            ("files", ("fine_1.txt", b"Healthcare MSA one", "text/plain")),
+            ("files", ("poison.txt", b"Healthcare MSA two", "text/plain")),
+            ("files", ("fine_2.txt", b"Healthcare MSA three", "text/plain")),
+        ]
+        job = await _upload_and_wait(ac, files)
+    status = {f["filename"]: f["status"] for f in job["files"]}
+    assert status == {"fine_1.txt": "done", "poison.txt": "failed", "fine_2.txt": "done"}
+    assert "index write failed" in next(f["error"] for f in job["files"] if f["filename"] == "poison.txt")
+
+
+@pytest.mark.asyncio
+async def test_query_keyset_pages_and_ndjson_export():
+    import orjson
+
+    names = [f"zanzibar_{i}.txt" for i in range(5)]
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        files = [("files", (n, f"Zanzibar shipping agreement {n}".encode(), "text/plain")) for n in names]
+        job = await _upload_and_wait(ac, files)
+        assert job["progress"]["done"] == 5
+
+        url = f"{settings.API_PREFIX}/query/documents"
+        seen, cursor = [], None
+        for _ in range(5):
+            params = {"question": "zanzibar shipping", "order": "recent", "limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            r = await ac.get(url, params=params)
+            assert r.status_code == 200
+            seen += [h["document"] for h in r.json()]
+            cursor = r.headers.get("x-next-cursor")
+            if not cursor:
+                break
+        assert seen == names[::-1]  # newest first, no overlap or gaps
+
+        r = await ac.get(url, params={"question": "zanzibar shipping", "format": "ndjson"})
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        assert [orjson.loads(line)["document"] for line in r.text.splitlines()] == names[::-1]
+
+        assert (await ac.get(url, params={"question": "zanzibar", "cursor": "not-a-cursor"})).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_repeated_questions_hit_the_query_caches():
+    from app.core.metrics import CACHE_LOOKUPS
+
+    def hits(cache):
+        return CACHE_LOOKUPS.labels(cache=cache, result="hit")._value.get()
+
+    parse_before, results_before = hits("query_parse"), hits("query_results")
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        url = f"{settings.API_PREFIX}/query/documents"
+        first = await ac.get(url, params={"question": "Which NDAs are under UK law?"})
+        again = await ac.get(url, params={"question": "  which ndas are UNDER uk law?"})
+        assert first.json() == again.json()
+        assert first.headers["etag"] == again.headers["etag"]
+        assert hits("query_parse") == parse_before + 1
+        assert hits("query_results") == results_before + 1
+
+        metrics = (await ac.get("/metrics")).text
+        assert 'cache_lookups_total{cache="query_parse",result="hit"}' in metrics
+
+
+@pytest.mark.asyncio
+async def test_metrics_use_route_templates_and_cover_ingestion():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        files = [("files", ("metrics_probe.txt", b"Retail NDA under Dubai law", "text/plain"))]
+        job = await _upload_and_wait(ac, files)
+        metrics = (await ac.get("/metrics")).text
+
+    route = f"{settings.API_PREFIX}/upload/jobs/{{job_id}}"
+    assert f'path="{route}"' in metrics
+    assert f'/upload/jobs/{job["id"]}"' not in metrics
+    for name in ("ingest_upload_bytes_total", "ingest_extract_text_seconds_count{kind=\"text\"}",
+                 "ingest_extract_metadata_seconds_count", "ingest_db_commit_seconds_count",
+                 "ingest_queue_depth{unit=\"files\"}", "ingest_documents_total"):
+        assert name in metrics, name
+
+
+def test_failed_commit_counts_each_attempt_once(monkeypatch):
+    from app.db import get_session
+    from app.models.document import Document
+    from app.models.job import IngestJob, IngestJobFile
+    from app.services import ingestion
+
+    def session_failing_first_commit():
+        session = get_session()
+        if not sessions:
+            def commit():
+                raise RuntimeError("disk I/O error")
+            session.commit = commit
+        sessions.append(session)
+        return session
+
+    with get_session() as session:
+        job = IngestJob(status="done")  # not claimable by a running queue
+        session.add(job)
+        session.flush()
+        files = [IngestJobFile(job_id=job.id, path=f"/nonexistent/{n}", original_name=n, content_type="text/plain",
+                               size_bytes=1) for n in ("unparsable.txt", "uncommitted.txt")]
+        session.add_all(files)
+        session.commit()
+        for f in files:
+            session.refresh(f)
+        session.expunge_all()
+
+    sessions = []
+    monkeypatch.setattr(ingestion, "get_session", session_failing_first_commit)
+    doc = Document(filename="uncommitted.txt", content_type="text/plain", size_bytes=1)
+    outcomes = [(files[0], None, None, "ValueError: bad bytes"), (files[1], doc, "body", None)]
+    assert ingestion._write_chunk(outcomes) == 1  # the chunk fails at commit; retried per file
+
+    with get_session() as session:
+        stored = [session.get(IngestJobFile, f.id) for f in files]
+    for f in (files[0], stored[0]):
+        assert (f.status, f.attempts, f.document_id) == ("queued", 1, None)
+    for f in (files[1], stored[1]):
+        assert (f.status, f.attempts, f.document_id) == ("done", 0, doc.id)
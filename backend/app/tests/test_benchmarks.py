@@ -0,0 +1,31 @@
+from benchmarks.corpus import contracts, generate
+from benchmarks.suite import compare, percentile
+from app.services.extraction import extract_metadata
+from app.services.text_utils import extract_text_from_file
+
+
+def test_corpus_is_reproducible_and_extractable(tmp_path):
+    first = generate(tmp_path / "a", 12, seed=7)
+    second = generate(tmp_path / "b", 12, seed=7)
+    assert [p.read_bytes() for p in first] == [p.read_bytes() for p in second]
+    assert {p.suffix for p in first} == {".txt", ".docx", ".pdf"}
+
+    types = {".txt": "text/plain", ".pdf": "application/pdf",
+             ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"}
+    for path, contract in zip(first, contracts(12, seed=7)):
+        text = extract_text_from_file(str(path), types[path.suffix])
+        assert "governed by the laws of" in text
+        assert extract_metadata(text)["agreement_type"] is not None, contract.name
+
+
+def test_compare_flags_regressions_in_the_right_direction():
+    baseline = {"upload_files_per_s": 100.0, "query_ms_p99": 10.0, "extract_txt_ms_p50": 0.02}
+    assert compare({"upload_files_per_s": 110.0, "query_ms_p99": 9.0, "extract_txt_ms_p50": 0.04}, baseline, 0.25) == []
+    regressions = compare({"upload_files_per_s": 60.0, "query_ms_p99": 20.0, "extract_txt_ms_p50": 0.02}, baseline, 0.25)
+    assert [r.split(":")[0] for r in regressions] == ["query_ms_p99", "upload_files_per_s"]
+
+
+def test_percentile():
+    samples = list(range(1, 101))
+    assert percentile(samples, 50) == 51
+    assert percentile(samples, 99) == 99
@@ -0,0 +1,14 @@
+import os
+
+from benchmarks.import_profile import measure_cold_start
+
+# Generous enough for a loaded CI runner; tighten via env on known hardware.
+BUDGET_S = float(os.getenv("COLD_START_BUDGET_S", "4.0"))
+BUDGET_MB = float(os.getenv("COLD_START_BUDGET_MB", "120"))
+
+
+def test_api_worker_cold_start_budget():
+    cold = measure_cold_start()
+    assert cold.loaded == [], f"imported eagerly: {cold.loaded}"
+    assert cold.seconds < BUDGET_S, f"import app.main took {cold.seconds:.2f}s"
+    assert cold.rss_mb < BUDGET_MB, f"import app.main peaked at {cold.rss_mb:.0f} MB"
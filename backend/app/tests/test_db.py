@@ -0,0 +1,29 @@
+from app.db.engine import _async_url, _sync_url
+
+
+def test_engine_urls_derive_from_one_setting():
+    assert _sync_url("sqlite+aiosqlite:///./app.db") == "sqlite:///./app.db"
+    assert _async_url("sqlite+aiosqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    assert _async_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    assert _sync_url("postgresql+asyncpg://u:p@db/legal") == "postgresql://u:p@db/legal"
+    assert _async_url("postgresql+psycopg2://u:p@db/legal") == "postgresql+asyncpg://u:p@db/legal"
+
+
+def test_readers_are_not_blocked_by_the_writer():
+    import pytest
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from app.db import engine, init_db, read_engine
+
+    if engine.dialect.name != "sqlite":
+        pytest.skip("SQLite profile only")
+    init_db()
+    with engine.connect() as writer:
+        assert writer.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        writer.exec_driver_sql("BEGIN IMMEDIATE")  # hold the write lock
+        writer.execute(text("UPDATE corpusversion SET version = version WHERE id = 1"))
+        with read_engine.connect() as reader:
+            assert reader.execute(text("SELECT count(*) FROM document")).scalar() >= 0
+            with pytest.raises(OperationalError):
+                reader.execute(text("DELETE FROM document WHERE id = -1"))
+        writer.rollback()
@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+
+from app.core.config import settings
+from app.services import extract_pool
+from app.services.extract_pool import ExtractionPool
+
+
+# Module-level so the spawned workers can unpickle them by reference.
+def _fake_extract(path: str, content_type: str) -> str:
+    if path.endswith("crash.pdf"):
+        os._exit(1)
+    if path.endswith("hang.pdf"):
+        time.sleep(60)
+    if path.endswith("slow.pdf"):
+        time.sleep(6)
+    if path.endswith("bad.pdf"):
+        raise ValueError("malformed PDF")
+    return f"text of {path}"
+
+
+def test_failures_are_isolated_per_file():
+    pool = ExtractionPool(workers=2, timeout_s=3, func=_fake_extract)
+    items = [(f"{name}.pdf", "application/pdf") for name in ("a", "crash", "b", "bad", "hang", "c")]
+    items.append(("notes.txt", "text/plain"))
+    try:
+        results = pool.extract_many(items)
+    finally:
+        pool.shutdown()
+
+    by_name = dict(zip((p for p, _ in items), results))
+    for ok in ("a.pdf", "b.pdf", "c.pdf", "notes.txt"):
+        assert by_name[ok].text == f"text of {ok}", by_name[ok]
+    assert "crashed" in by_name["crash.pdf"].error
+    assert "ValueError" in by_name["bad.pdf"].error
+    assert "timed out" in by_name["hang.pdf"].error
+
+
+def test_workers_leave_no_multiprocess_metric_files(tmp_path, monkeypatch):
+    # as under gunicorn: children inherit the directory, recycled after every file
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    pool = ExtractionPool(workers=1, timeout_s=30, max_tasks_per_child=1, func=_fake_extract)
+    try:
+        results = pool.extract_many([(f"{n}.pdf", "application/pdf") for n in "abc"])
+    finally:
+        pool.shutdown()
+    assert [r.text for r in results] == [f"text of {n}.pdf" for n in "abc"]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_slow_full_text_pass_neither_blocks_nor_kills_next_extraction(monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACT_WORKERS", 1)
+    monkeypatch.setattr(settings, "EXTRACT_TIMEOUT_S", 3)
+    monkeypatch.setattr(settings, "PDF_FULL_TEXT_WORKERS", 1)
+    monkeypatch.setattr(settings, "PDF_FULL_TEXT_TIMEOUT_S", 30)
+    monkeypatch.setattr(extract_pool, "_pool", None)
+    monkeypatch.setattr(extract_pool, "_full_text_pool", None)
+    pool, full_text = extract_pool.get_extraction_pool(), extract_pool.get_full_text_pool()
+    deferred = []
+    try:
+        worker = threading.Thread(
+            target=lambda: deferred.extend(full_text.extract_many([("slow.pdf", "application/pdf")], func=_fake_extract))
+        )
+        worker.start()
+        time.sleep(1)  # the deferred pass now holds its pool
+        started = time.monotonic()
+        [result] = pool.extract_many([("a.pdf", "application/pdf")], func=_fake_extract)
+        took = time.monotonic() - started
+        worker.join()
+    finally:
+        extract_pool.shutdown_extraction_pool()
+
+    assert result.text == "text of a.pdf"
+    assert took < 4, f"next job's extraction waited {took:.1f}s"
+    assert deferred[0].text == "text of slow.pdf", deferred[0].error
@@ -0,0 +1,60 @@
+from benchmarks.corpus import pdf_bytes
+from app.services.extraction import PdfBudget, extract_metadata, find_vocabulary_hits, stream_pdf
+from app.services.text_utils import extract_text_from_pdf
+from app.utils.matching import TermMatcher
+
+
+def test_priority_order_not_text_order():
+    # "NDA" outranks "MSA" in AGREEMENT_TYPES even though MSA appears first
+    md = extract_metadata("This MSA references an NDA signed under UK law in the Middle East.")
+    assert md == {"agreement_type": "NDA", "governing_law": "UK", "geography": "Middle East", "industry": None}
+
+
+def test_non_disclosure_marker_is_a_substring_match():
+    assert extract_metadata("Mutual non-disclosures, Finance sector")["agreement_type"] == "NDA"
+    assert extract_metadata("nothing here")["agreement_type"] == "Unknown"
+
+
+def test_word_boundaries():
+    md = extract_metadata("Our business is in Dubai")
+    assert md["governing_law"] == "Dubai"  # "us" inside "business" does not count
+
+
+def test_hits_report_offsets_and_counts():
+    text = "US law. Governed by US and UK law; Abu Dhabi office."
+    hits = find_vocabulary_hits(text)
+    assert hits["governing_law"]["US"] == [0, 20]
+    assert len(hits["governing_law"]["UK"]) == 1
+    assert text[hits["governing_law"]["Abu Dhabi"][0]:].startswith("Abu Dhabi")
+
+
+def test_overlapping_terms_are_all_reported():
+    m = TermMatcher({"a": ["Abu", "Abu Dhabi"], "b": ["Dhabi"]})
+    assert sorted(m.finditer("ABU DHABI")) == [("a", "Abu", 0), ("a", "Abu Dhabi", 0), ("b", "Dhabi", 4)]
+
+
+def _three_page_pdf(tmp_path, first_page):
+    filler = ["Either party may terminate this agreement on notice."] * 30  # one page each
+    path = tmp_path / "bundle.pdf"
+    path.write_bytes(pdf_bytes(first_page + filler[len(first_page):] + filler + filler + ["Governed by Delaware law."]))
+    return str(path)
+
+
+def test_stream_pdf_stops_once_every_field_is_resolved(tmp_path):
+    path = _three_page_pdf(tmp_path, ["NDA governed by UK law, Middle East, Healthcare sector."])
+    result = stream_pdf(path)
+    assert not result.complete
+    assert "Delaware" not in result.text  # later pages were never laid out
+    assert result.metadata == {"agreement_type": "NDA", "governing_law": "UK",
+                               "geography": "Middle East", "industry": "Healthcare"}
+
+
+def test_stream_pdf_budgets_and_full_read(tmp_path):
+    path = _three_page_pdf(tmp_path, ["NDA governed by UK law."])
+    assert not stream_pdf(path, PdfBudget(max_pages=2)).complete
+    assert not stream_pdf(path, PdfBudget(max_chars=10)).complete
+
+    full = stream_pdf(path)  # fields never all resolve: reads to the end
+    assert full.complete
+    assert full.text == extract_text_from_pdf(path)
+    assert full.metadata == extract_metadata(full.text)  # same classification as a whole-file parse
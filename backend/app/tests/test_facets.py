@@ -0,0 +1,73 @@
+import threading
+import time
+from datetime import date, datetime
+
+from app.services.facets import FacetIndex
+
+ROWS = [
+    # id, created_at, agreement_type, governing_law, geography, industry
+    (1, datetime(2024, 3, 1), "NDA", "Delaware", "United States", "Technology"),
+    (2, datetime(2025, 1, 5), "NDA", "Delaware", "United States", "Finance"),
+    (3, datetime(2025, 6, 9), "NDA", "UK", "Europe", "Finance"),
+    (4, datetime(2025, 7, 1), "MSA", "Delaware", None, "Technology"),
+    (5, datetime(2025, 12, 31), "NDA", "Delaware", "United States", "Technology"),
+]
+
+
+def _index(rows=ROWS) -> FacetIndex:
+    index = FacetIndex()
+    index.add(rows)
+    return index
+
+
+def test_unfiltered_counts_every_document():
+    r = _index().query()
+    assert r["count_documents"] == 5
+    assert r["agreement_types"] == {"NDA": 4, "MSA": 1}
+    assert r["geographies"] == {"United States": 3, "Europe": 1, "Unknown": 1}
+    assert r["years"] == {"2024": 1, "2025": 4}
+
+
+def test_filters_and_across_columns_or_within():
+    index = _index()
+    r = index.query({"agreement_type": ["NDA"], "governing_law": ["Delaware"]},
+                    date_from=date(2025, 1, 1), date_to=date(2026, 1, 1))
+    assert r["count_documents"] == 2
+    assert r["industries"] == {"Finance": 1, "Technology": 1}
+
+    r = index.query({"governing_law": ["UK", "Delaware"], "industry": ["Finance"]})
+    assert r["count_documents"] == 2
+    assert index.query({"governing_law": ["Mars"]})["count_documents"] == 0
+
+
+def test_cross_tab_and_incremental_add():
+    index = _index(ROWS[:3])
+    assert index.add(ROWS) == 2  # rows already loaded are skipped
+    r = index.query(cross=("agreement_type", "industry"))
+    assert r["cross"]["counts"] == {"NDA": {"Technology": 2, "Finance": 2}, "MSA": {"Technology": 1}}
+    assert index.last_id == 5
+
+
+def test_chunks_are_appended_in_one_step():
+    index = FacetIndex()
+    assert index.extend([ROWS[:2], ROWS[1:4], [], ROWS[3:]]) == 5  # overlapping rows are skipped
+    assert index.query()["agreement_types"] == {"NDA": 4, "MSA": 1}
+    assert index.last_id == 5
+
+
+def test_concurrent_catch_up_loads_once(monkeypatch):
+    index = FacetIndex()
+    loads = []
+
+    def slow_sync(session):
+        loads.append(1)
+        time.sleep(0.2)
+        index.version = 7
+
+    monkeypatch.setattr(index, "sync", slow_sync)
+    threads = [threading.Thread(target=index.catch_up, args=(7,)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(loads) == 1
@@ -0,0 +1,69 @@
+import io
+import threading
+
+import orjson
+import pytest
+import structlog
+
+from app.core.logging import QueuedLogSink, _level_number, sample_debug
+
+
+class SlowStream(io.BytesIO):
+    """A stdout that stalls until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, data):
+        self.release.wait(5)
+        return super().write(data)
+
+
+def _lines(stream):
+    return [orjson.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_drop_policy_never_blocks_and_reports_drops():
+    stream = SlowStream()
+    sink = QueuedLogSink(stream, maxsize=2, policy="drop")
+    for i in range(50):  # returns immediately although the writer is stalled
+        sink.write(orjson.dumps({"event": "e", "i": i}) + b"\n")
+    stream.release.set()
+    sink.close()
+
+    lines = _lines(stream)
+    dropped = [l for l in lines if l["event"] == "log_events_dropped"]
+    kept = [l for l in lines if l["event"] == "e"]
+    assert dropped and len(kept) + sum(d["count"] for d in dropped) == 50
+
+
+def test_block_policy_keeps_every_event():
+    stream = io.BytesIO()
+    sink = QueuedLogSink(stream, maxsize=2, policy="block", batch=3)
+    for i in range(100):
+        sink.write(orjson.dumps({"event": "e", "i": i}) + b"\n")
+    sink.close()
+    assert [l["i"] for l in _lines(stream)] == list(range(100))
+
+
+def test_writes_after_close_go_straight_to_the_stream():
+    stream = io.BytesIO()
+    sink = QueuedLogSink(stream)
+    sink.close()
+    sink.write(b'{"event":"late"}\n')
+    assert _lines(stream) == [{"event": "late"}]
+
+
+def test_sample_debug_only_drops_debug_events():
+    processor = sample_debug(0.0)
+    with pytest.raises(structlog.DropEvent):
+        processor(None, "debug", {"event": "noisy"})
+    assert processor(None, "info", {"event": "kept"}) == {"event": "kept"}
+
+
+def test_log_level_names_are_validated():
+    assert _level_number("debug") == 10
+    assert _level_number("WARN") == 30
+    with pytest.raises(ValueError, match="unknown log level 'VERBOSE'"):
+        _level_number("VERBOSE")
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from httpx import ASGITransport, AsyncClient
+
+from app.main import EdgeMiddleware
+
+
+def _app(**kwargs) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"bytes": len(await request.body())}
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(1)
+        return {}
+
+    app.add_middleware(EdgeMiddleware, window_s=60, max_requests=1000, **kwargs)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_streamed_body_limit_without_content_length():
+    async def body():
+        for _ in range(4):
+            yield b"x" * 10
+
+    transport = ASGITransport(app=_app(max_body_bytes=25))
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        ok = await ac.post("/echo", content=b"x" * 20, headers={"content-type": "text/plain"})
+        assert ok.json() == {"bytes": 20}
+        assert ok.headers["x-content-type-options"] == "nosniff"
+
+        r = await ac.post("/echo", content=body(), headers={"content-type": "text/plain"})
+        assert "content-length" not in r.request.headers
+        assert r.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_timeout_applies_until_the_response_starts():
+    transport = ASGITransport(app=_app(timeout_s=0.05))
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        r = await ac.get("/slow")
+        assert r.status_code == 408
+        assert r.headers["x-frame-options"] == "DENY"
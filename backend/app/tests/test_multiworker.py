@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.inflight import InFlight, begin_server_drain, forget_worker, in_flight
+from app.main import app
+
+BACKEND = Path(__file__).resolve().parents[2]
+
+
+def test_in_flight_counts_are_shared_through_the_directory(tmp_path):
+    counter = InFlight(str(tmp_path))
+    counter.enter()
+    counter.enter()
+    counter.exit()
+    (tmp_path / "inflight_999999").write_bytes((3).to_bytes(8, sys.byteorder))  # another worker
+    assert counter.count == 1
+    assert counter.total() == 4
+
+    forget_worker(str(tmp_path), 999999)
+    assert counter.total() == 1
+    assert not counter.draining
+    begin_server_drain(str(tmp_path))
+    assert counter.draining
+
+
+def test_metrics_aggregate_across_processes(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+
+    def run(code: str) -> str:
+        return subprocess.run(
+            [sys.executable, "-c", f"import app.core.metrics as m; {code}"],
+            cwd=BACKEND, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+
+    run("m.DOCUMENTS.inc(2)")
+    run("m.DOCUMENTS.inc(3)")
+    assert "ingest_documents_total 5.0" in run("print(m.render().decode())")
+
+
+@pytest.mark.asyncio
+async def test_ready_reports_draining(monkeypatch):
+    monkeypatch.setattr(in_flight, "_draining", True)
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        r = await ac.get("/readyz")
+    assert r.status_code == 503
+    assert r.json()["draining"] is True
@@ -0,0 +1,24 @@
+from app.utils.nlp_simple import extract_filters
+
+
+def test_every_mention_becomes_a_filter():
+    assert extract_filters("Healthcare MSAs under UK law?") == {
+        "industry": ("Healthcare",),
+        "agreement_type": ("MSA", "Master Services Agreement"),
+        "governing_law": ("UK",),
+    }
+    assert extract_filters("NDAs in Abu Dhabi or the UAE") == {
+        "agreement_type": ("NDA",),
+        "governing_law": ("Abu Dhabi", "UAE"),
+    }
+
+
+def test_aliases_match_whole_words_only():
+    assert extract_filters("business contracts for our customers") == {}
+    assert extract_filters("show us contracts in Europe") == {"geography": ("Europe",)}
+    assert extract_filters("contracts governed by us law") == {"governing_law": ("US",)}
+
+
+def test_law_context_picks_governing_law_over_geography():
+    assert extract_filters("contracts in the United States") == {"geography": ("United States",)}
+    assert extract_filters("contracts under United States law") == {"governing_law": ("US",)}
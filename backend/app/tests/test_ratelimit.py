@@ -0,0 +1,60 @@
+import sqlite3
+import time
+
+from app.services.ratelimit import MemoryRateLimiter, SQLiteRateLimiter
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket_allows_burst_then_refills():
+    clock = FakeClock()
+    limiter = MemoryRateLimiter(rate=1.0, burst=3, clock=clock)
+    assert [limiter.acquire("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("a") > 0
+    assert limiter.acquire("b") == 0.0  # keys are independent
+    clock.now += 1.0
+    assert limiter.acquire("a") == 0.0
+
+
+def test_idle_and_excess_keys_are_evicted():
+    clock = FakeClock()
+    limiter = MemoryRateLimiter(rate=1.0, burst=2, max_keys=3, clock=clock)
+    for i in range(10):
+        limiter.acquire(f"ip{i}")
+    assert len(limiter) == 3
+    clock.now += 5.0  # everyone refilled
+    limiter.acquire("fresh")
+    assert len(limiter) == 1
+
+
+def test_sqlite_buckets_are_shared_between_limiters(tmp_path):
+    path = tmp_path / "rl.db"
+    worker_a = SQLiteRateLimiter(path, rate=0.001, burst=2)
+    worker_b = SQLiteRateLimiter(path, rate=0.001, burst=2)
+    assert worker_a.acquire("1.2.3.4") == 0.0
+    assert worker_b.acquire("1.2.3.4") == 0.0
+    assert worker_a.acquire("1.2.3.4") > 0
+    assert worker_b.acquire("5.6.7.8") == 0.0
+
+
+def test_sqlite_lock_held_by_another_worker_fails_open_quickly(tmp_path):
+    path = tmp_path / "rl.db"
+    limiter = SQLiteRateLimiter(path, rate=0.001, burst=1, busy_timeout_s=0.005)
+    assert limiter.acquire("1.2.3.4") == 0.0
+    assert limiter.acquire("1.2.3.4") > 0
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")  # another process mid-write
+    try:
+        start = time.perf_counter()
+        assert limiter.acquire("1.2.3.4") == 0.0
+        assert time.perf_counter() - start < 0.5
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert limiter.acquire("1.2.3.4") > 0
@@ -0,0 +1,48 @@
+from app.services.retrieval import RetrievalIndex
+
+
+DOCS = [
+    (1, "This Non-Disclosure Agreement is governed by Delaware law."),
+    (2, "The Supplier shall pay liquidated damages for late delivery of goods."),
+    (3, "Employment Agreement: the employee is entitled to annual leave and a bonus."),
+]
+
+
+def test_search_ranks_by_cosine():
+    index = RetrievalIndex(dim=1 << 12)
+    assert index.add(DOCS) == 3
+    hits = index.search("liquidated damages for late delivery", top_k=2)
+    assert hits[0][0] == 2
+    assert index.search("zebra", top_k=3) == []
+
+
+def test_incremental_add_skips_known_ids():
+    index = RetrievalIndex(dim=1 << 12)
+    index.add(DOCS[:2])
+    assert index.add(DOCS) == 1
+    assert len(index) == 3
+    assert index.search("annual leave bonus")[0][0] == 3
+
+
+def test_persist_roundtrip(tmp_path):
+    path = tmp_path / "idx.npz"
+    index = RetrievalIndex(dim=1 << 12, path=path)
+    index.add(DOCS)
+    index.save()
+
+    loaded = RetrievalIndex.load(path, dim=1 << 12)
+    assert loaded.last_id == 3
+    assert loaded.search("Delaware non-disclosure") == index.search("Delaware non-disclosure")
+
+
+def test_one_at_a_time_adds_keep_few_segments_and_same_ranking():
+    docs = [(i, f"clause {i} term{i % 7} shared words {'indemnity ' * (i % 5)}") for i in range(1, 201)]
+    bulk = RetrievalIndex(dim=1 << 12)
+    bulk.add(docs)
+    incremental = RetrievalIndex(dim=1 << 12)
+    for doc in docs:
+        incremental.add([doc])
+    assert len(incremental._segments) <= 8  # O(log n), not one per add
+    for q in ("indemnity term3", "clause 42 shared"):
+        assert [d for d, _ in incremental.search(q, top_k=5)] == [d for d, _ in bulk.search(q, top_k=5)]
+
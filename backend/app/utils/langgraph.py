@@ -15,15 +15,17 @@ Sample usage (after implementing _request):
 """
 from __future__ import annotations
 
-from typing import Any, Dict, Optional, List
+from typing import Any, Dict, Optional, List, Tuple
 
-from app.db.session import get_session
+from app.db.session import get_read_session
 from app.models.document import Document
+from app.services.bodies import iter_bodies, load_bodies
+from app.services.retrieval import get_retrieval_index
 from sqlmodel import select
 
 # --- Minimal LangChain-style placeholder for DB + LLM QA ---
 class LangChainSearch:
-    """Naive DB retriever + optional LLM summarize."""
+    """Hashed TF-IDF retriever + optional LLM summarize."""
 
     def __init__(self) -> None:
         try:
@@ -38,25 +40,25 @@ class LangChainSearch:
             self._ChatOpenAI = None
             self._has_lc = False
 
-    def _retrieve(self, question: str, top_k: int = 3) -> List[Document]:
-        # Simple LIKE search over Document.text.
-        with get_session() as s:
-            q = select(Document).where(Document.text.is_not(None))
-            docs = list(s.exec(q))
-        question_l = question.lower()
-        scored = []
-        for d in docs:
-            t = (d.text or "").lower()
-            score = t.count(question_l) if question_l else 0
-            if score > 0:
-                scored.append((score, d))
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [d for _, d in scored[:top_k]] or docs[:top_k]
+    def _retrieve(self, question: str, top_k: int = 3) -> List[Tuple[Document, str]]:
+        # Cosine top-k over the hashed TF-IDF index; only the winners (and
+        # their bodies) are loaded.
+        index = get_retrieval_index()
+        with get_read_session() as s:
+            index.sync(s)
+            ids = [doc_id for doc_id, _ in index.search(question, top_k=top_k)]
+            if not ids:
+                ids = [doc_id for doc_id, _ in iter_bodies(s, 0, top_k)]
+            by_id = {d.id: d for d in s.exec(select(Document).where(Document.id.in_(ids)))}
+            docs = [by_id[i] for i in ids if i in by_id]
+            bodies = load_bodies(s, docs)
+        return [(d, bodies.get(d.id, "")) for d in docs]
 
     def qa(self, question: str, top_k: int = 3) -> Dict[str, Any]:
-        ctx_docs = self._retrieve(question, top_k=top_k)
+        ctx = self._retrieve(question, top_k=top_k)
+        ctx_docs = [d for d, _ in ctx]
         context = "\n\n".join(
-            f"[{d.id}] {d.filename}\n{(d.text or '')[:1200]}" for d in ctx_docs
+            f"[{d.id}] {d.filename}\n{body[:1200]}" for d, body in ctx
         )
         if not self._has_lc:
             return {
@@ -0,0 +1,121 @@
+"""
+Single-pass multi-term matcher.
+
+All terms are folded into one regex built from a character trie, so a
+text is scanned once no matter how many terms there are. The pattern is a zero-width lookahead, which lets matches overlap: at
+every position the longest term wins, and the shorter terms it implies
+(its whole-word prefixes) are reported with it.
+
+Word-bounded terms behave like ``re.search(rf"\\b{term}\\b", text, re.I)``.
+Substring terms behave like ``term.lower() in text.lower()``.
+"""
+import re
+from collections import defaultdict
+from typing import Dict, Iterator, List, Mapping, Sequence, Tuple
+
+Hits = Dict[str, Dict[str, List[int]]]  # label -> term -> match offsets
+
+
+def trie_pattern(words: Sequence[str]) -> str:
+    """Regex alternation of `words` factored by common prefix (longest match first)."""
+    trie: dict = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class TermMatcher:
+    def __init__(
+        self,
+        vocabularies: Mapping[str, Sequence[str]],
+        substrings: Mapping[str, Sequence[str]] = {},
+    ) -> None:
+        self.labels = list(vocabularies) + [k for k in substrings if k not in vocabularies]
+        self._bounded = self._entries(vocabularies)
+        self._substr = self._entries(substrings)
+        self._bounded_implied = self._implied(self._bounded, bounded=True)
+        self._substr_implied = self._implied(self._substr, bounded=False)
+
+        parts = []
+        if self._bounded:
+            word = rf"\b(?=(?P<word>{trie_pattern(list(self._bounded))})\b)"
+            if self._substr:
+                # a substring term may start where a word term does
+                word += rf"(?=(?P<sub>{trie_pattern(list(self._substr))}))?"
+            parts.append(word)
+        if self._substr:
+            parts.append(rf"(?=(?P<sub_only>{trie_pattern(list(self._substr))}))")
+        if parts:
+            # cheap first-character test before trying the branches
+            first = "".join(sorted({re.escape(k[0]) for k in [*self._bounded, *self._substr] if k}))
+            pattern = rf"(?=[{first}])(?:{'|'.join(parts)})"
+        else:
+            pattern = r"(?!)"
+        self._re = re.compile(pattern)
+        self._re_ignorecase = re.compile(pattern, re.I)
+
+    @staticmethod
+    def _entries(vocab: Mapping[str, Sequence[str]]) -> Dict[str, List[Tuple[str, str]]]:
+        entries: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        for label, terms in vocab.items():
+            for t in terms:
+                entries[t.lower()].append((label, t))
+        return dict(entries)
+
+    @staticmethod
+    def _implied(entries: Mapping[str, List[Tuple[str, str]]], bounded: bool) -> Dict[str, List[str]]:
+        # key -> every key that also matches wherever `key` matches (itself included)
+        implied: Dict[str, List[str]] = {}
+        for long in entries:
+            implied[long] = [
+                short for short in entries
+                if long.startswith(short) and (
+                    not bounded or short == long or re.match(rf"{re.escape(short)}\b", long)
+                )
+            ]
+        return implied
+
+    def finditer(self, text: str) -> Iterator[Tuple[str, str, int]]:
+        """Yield (label, term, offset) for every occurrence, in text order."""
+        # Matching lowercased text is ~3x faster than re.I; fall back when
+        # lowercasing changes the length (offsets would no longer line up).
+        lowered = text.lower()
+        matches = self._re.finditer(lowered) if len(lowered) == len(text) else self._re_ignorecase.finditer(text)
+        for m in matches:
+            groups = m.groupdict()
+            found = (
+                (groups.get("word"), self._bounded_implied, self._bounded),
+                (groups.get("sub") or groups.get("sub_only"), self._substr_implied, self._substr),
+            )
+            for matched, implied, entries in found:
+                if not matched:
+                    continue
+                for key in implied.get(matched.lower(), ()):
+                    for label, term in entries[key]:
+                        yield label, term, m.start()
+
+    def scan(self, text: str, base: int = 0) -> Hits:
+        """Offsets of every term hit, grouped by label. `base` shifts offsets (for chunked input)."""
+        hits: Hits = {label: {} for label in self.labels}
+        for label, term, offset in self.finditer(text):
+            hits[label].setdefault(term, []).append(base + offset)
+        return hits
+
+
+def first_hit(terms: Sequence[str], hits: Mapping[str, List[int]]):
+    """First term of `terms` (priority order) that was hit, or None."""
+    for t in terms:
+        if t in hits:
+            return t
+    return None
@@ -1,71 +1,124 @@
-import re
-from typing import Dict, Optional
+"""
+Question -> metadata filters.
 
-PLACE_ALIASES: Dict[str, str] = {
-    "uae": "United Arab Emirates",
-    "united arab emirates": "United Arab Emirates",
-    "ksa": "Saudi Arabia",
-    "saudi": "Saudi Arabia",
-    "us": "United States",
-    "usa": "United States",
-    "united states": "United States",
-    "uk": "United Kingdom",
-    "united kingdom": "United Kingdom",
-    "england": "United Kingdom",
-    "scotland": "United Kingdom",
-    "wales": "United Kingdom",
-    "northern ireland": "United Kingdom",
-    "delaware": "Delaware",
-    "california": "California",
-    "dubai": "Dubai",
-    "abu dhabi": "Abu Dhabi",
-    "europe": "Europe",
-    "gcc": "GCC",
+Place, agreement-type and industry aliases are compiled once into a single
+TermMatcher, so a question is scanned in one pass with word boundaries
+("us" does not match inside "business"). Every mention becomes a filter
+value, normalized to the labels ingestion stores (services/extraction.py):
+values for the same column are alternatives (OR), different columns
+narrow the result (AND).
+"""
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.utils.matching import TermMatcher
+
+# alias -> (governing_law value, geography value); either may be None
+PLACE_ALIASES: Dict[str, Tuple[Optional[str], Optional[str]]] = {
+    "uae": ("UAE", None),
+    "united arab emirates": ("UAE", None),
+    "emirates": ("UAE", None),
+    "ksa": ("KSA", None),
+    "saudi": ("KSA", None),
+    "saudi arabia": ("KSA", None),
+    "us": ("US", "United States"),
+    "usa": ("US", "United States"),
+    "united states": ("US", "United States"),
+    "uk": ("UK", None),
+    "united kingdom": ("UK", None),
+    "england": ("UK", None),
+    "scotland": ("UK", None),
+    "wales": ("UK", None),
+    "northern ireland": ("UK", None),
+    "eu": ("EU", None),
+    "european union": ("EU", None),
+    "delaware": ("Delaware", None),
+    "dubai": ("Dubai", None),
+    "abu dhabi": ("Abu Dhabi", None),
+    "europe": (None, "Europe"),
+    "middle east": (None, "Middle East"),
+    "asia": (None, "Asia"),
+    "gcc": (None, "GCC"),
+}
+
+# alias -> stored agreement_type values it covers
+AGREEMENT_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "nda": ("NDA",),
+    "ndas": ("NDA",),
+    "non-disclosure": ("NDA",),
+    "non-disclosure agreement": ("NDA",),
+    "msa": ("MSA", "Master Services Agreement"),
+    "msas": ("MSA", "Master Services Agreement"),
+    "master services agreement": ("MSA", "Master Services Agreement"),
+    "franchise agreement": ("Franchise Agreement",),
+    "franchise": ("Franchise Agreement",),
+    "supplier agreement": ("Supplier Agreement",),
+    "supply agreement": ("Supplier Agreement",),
+    "employment agreement": ("Employment Agreement",),
+    "employment contract": ("Employment Agreement",),
+}
+
+INDUSTRY_ALIASES: Dict[str, str] = {
+    "oil & gas": "Oil & Gas",
+    "oil and gas": "Oil & Gas",
+    "healthcare": "Healthcare",
+    "health care": "Healthcare",
+    "technology": "Technology",
+    "tech": "Technology",
+    "finance": "Finance",
+    "financial": "Finance",
+    "banking": "Finance",
+    "retail": "Retail",
 }
 
-# common phrasings: "governed by X law", "under X law", "valid in X", "applicable in X"
-PATTERNS = [
-    r"governed by (?P<place>[a-zA-Z\s]+?) law",
-    r"under (?P<place>[a-zA-Z\s]+?) law",
-    r"valid in (?P<place>[a-zA-Z\s]+)",
-    r"applicable in (?P<place>[a-zA-Z\s]+)",
-    r"in (?P<place>[a-zA-Z\s]+)$",
-    r"(?P<place>[a-zA-Z\s]+) law",
-]
+# a place mention next to one of these words is a governing-law filter
+LAW_WORDS = {"law", "laws", "governed", "governing", "jurisdiction", "under"}
+# aliases that are also common words: only a place right after "in/under/by" or before "law"
+AMBIGUOUS_ALIASES = {"us"}
 
-def _normalize_place(raw: str) -> Optional[str]:
-    key = raw.strip().lower()
-    if key in PLACE_ALIASES:
-        return PLACE_ALIASES[key]
-    # try word-by-word collapse (e.g., "u a e")
-    collapsed = key.replace(".", "").replace(" ", "")
-    if collapsed in ("uae", "usa", "uk", "ksa"):
-        return PLACE_ALIASES.get(collapsed, raw.strip())
-    # capitalize words otherwise
-    return " ".join(w.capitalize() for w in raw.strip().split()) if raw.strip() else None
+_MATCHER = TermMatcher({
+    "place": list(PLACE_ALIASES),
+    "agreement_type": list(AGREEMENT_ALIASES),
+    "industry": list(INDUSTRY_ALIASES),
+})
 
-def extract_filters(question: str) -> Dict[str, str]:
+
+def _is_place(q: str, alias: str, offset: int) -> bool:
+    if alias not in AMBIGUOUS_ALIASES:
+        return True
+    before = q[:offset].split()[-1:]
+    after = q[offset + len(alias):].split()[:1]
+    return before in (["in"], ["under"], ["by"]) or after in (["law"], ["laws"])
+
+
+def extract_filters(question: str) -> Dict[str, Tuple[str, ...]]:
     """
-    Returns a dict of filters we can apply to Document fields.
-    Supported keys: governing_law, geography
+    Filters we can apply to Document fields, as {column: values}.
+    Supported keys: governing_law, geography, agreement_type, industry.
     """
     q = question.lower().strip()
-    # 1) explicit patterns
-    for pat in PATTERNS:
-        m = re.search(pat, q)
-        if m and m.group("place"):
-            place = _normalize_place(m.group("place"))
-            if place:
-                # if phrased as 'law', prefer governing_law; otherwise geography
-                if "law" in pat or "law" in q:
-                    return {"governing_law": place}
-                return {"geography": place}
-    # 2) fall back: scan tokens and map to a known place
-    for alias in sorted(PLACE_ALIASES.keys(), key=len, reverse=True):
-        if alias in q:
-            place = PLACE_ALIASES[alias]
-            # prefer governing_law if question mentions 'law'
-            if "law" in q or "governed" in q or "under" in q:
-                return {"governing_law": place}
-            return {"geography": place}
-    return {}  # no filters
+    words = set(q.replace("?", " ").replace(",", " ").split())
+    law_context = bool(words & LAW_WORDS)
+
+    found: Dict[str, List[str]] = {}
+    seen: Dict[str, Set[str]] = {}
+
+    def add(column: str, value: str) -> None:
+        if value not in seen.setdefault(column, set()):
+            seen[column].add(value)
+            found.setdefault(column, []).append(value)
+
+    for label, alias, offset in _MATCHER.finditer(q):
+        if label == "place":
+            if not _is_place(q, alias, offset):
+                continue
+            law, geography = PLACE_ALIASES[alias]
+            if law and (law_context or not geography):
+                add("governing_law", law)
+            else:
+                add("geography", geography)
+        elif label == "agreement_type":
+            for value in AGREEMENT_ALIASES[alias]:
+                add("agreement_type", value)
+        else:
+            add("industry", INDUSTRY_ALIASES[alias])
+    return {column: tuple(values) for column, values in found.items()}
@@ -0,0 +1,170 @@
+"""
+Synthetic legal corpus generator.
+
+Contracts are assembled from the extraction vocabularies (agreement types,
+jurisdictions, geographies, industries) plus boilerplate clauses, and
+written as text, DOCX and PDF files. Output is a pure function of
+(size, seed), so every benchmark run sees the same bytes.
+
+    cd backend && python -m benchmarks.corpus ./bench-corpus --size 1000
+"""
+import argparse
+import io
+import random
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Sequence
+
+from docx import Document as DocxDocument
+
+from app.services.extraction import AGREEMENT_TYPES, GEOGRAPHIES, INDUSTRIES, JURISDICTIONS
+
+EPOCH = datetime(2024, 1, 1)
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+# share of each format in a generated corpus
+FORMAT_MIX = (("txt", 0.5), ("docx", 0.3), ("pdf", 0.2))
+
+PARTIES = [
+    "Acme Holdings", "Globex Corporation", "Initech LLC", "Umbrella Trading", "Stark Industries",
+    "Wayne Enterprises", "Hooli Inc", "Vandelay Imports", "Soylent Foods", "Cyberdyne Systems",
+]
+CLAUSES = [
+    "The Receiving Party shall hold all Confidential Information in strict confidence and shall not disclose it to any third party.",
+    "Either party may terminate this Agreement upon thirty (30) days written notice to the other party.",
+    "The Supplier shall deliver the Goods in accordance with the delivery schedule set out in Schedule 2.",
+    "All fees are payable within forty-five (45) days of the date of a valid invoice.",
+    "Neither party shall be liable for any indirect, incidental or consequential damages arising out of this Agreement.",
+    "The Employee shall be entitled to twenty-five (25) days of paid annual leave in each calendar year.",
+    "Each party shall comply with all applicable anti-bribery and anti-corruption laws.",
+    "The Franchisee shall operate the Business in accordance with the Operations Manual.",
+    "Any dispute arising out of or in connection with this Agreement shall be referred to arbitration.",
+    "This Agreement constitutes the entire agreement between the parties and supersedes all prior agreements.",
+    "The Service Provider shall maintain insurance cover with a reputable insurer for the term of this Agreement.",
+    "Force majeure events shall suspend the affected party's obligations for the duration of the event.",
+]
+
+
+class Contract(NamedTuple):
+    name: str
+    fmt: str
+    paragraphs: List[str]
+
+
+def _contract(rng: random.Random, i: int, fmt: str) -> Contract:
+    agreement = rng.choice(AGREEMENT_TYPES)
+    law = rng.choice(JURISDICTIONS)
+    a, b = rng.sample(PARTIES, 2)
+    paragraphs = [
+        f"{agreement.upper()}",
+        f"This {agreement} is entered into between {a} and {b}.",
+        f"The parties operate in the {rng.choice(INDUSTRIES)} sector across {rng.choice(GEOGRAPHIES)}.",
+    ]
+    paragraphs += [f"{n}. {c}" for n, c in enumerate(rng.choices(CLAUSES, k=rng.randint(8, 40)), start=1)]
+    paragraphs.append(f"This Agreement shall be governed by the laws of {law}.")
+    slug = agreement.lower().replace(" ", "_").replace("-", "_")
+    return Contract(f"contract_{i:06d}_{slug}.{fmt}", fmt, paragraphs)
+
+
+def contracts(size: int, seed: int = 42) -> Iterator[Contract]:
+    rng = random.Random(seed)
+    formats = [fmt for fmt, _ in FORMAT_MIX]
+    weights = [w for _, w in FORMAT_MIX]
+    for i in range(size):
+        yield _contract(rng, i, rng.choices(formats, weights)[0])
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _wrap(paragraphs: Sequence[str], width: int = 90) -> List[str]:
+    lines: List[str] = []
+    for p in paragraphs:
+        words, line = p.split(), ""
+        for w in words:
+            if line and len(line) + 1 + len(w) > width:
+                lines.append(line)
+                line = w
+            else:
+                line = f"{line} {w}" if line else w
+        lines += [line, ""]
+    return lines
+
+
+def pdf_bytes(paragraphs: Sequence[str], lines_per_page: int = 60) -> bytes:
+    """A minimal text PDF (Helvetica, no compression) that pdfminer can read."""
+    lines = _wrap(paragraphs)
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    objects: List[bytes] = []  # object n lives at objects[n - 1]
+    n_pages = len(pages)
+    kids = " ".join(f"{4 + 2 * k} 0 R" for k in range(n_pages))
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {n_pages} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for page in pages:
+        body = "BT /F1 10 Tf 12 TL 50 770 Td " + " ".join(f"({_pdf_escape(l)}) Tj T*" for l in page) + " ET"
+        content = body.encode("latin-1", "replace")
+        page_no = len(objects) + 1
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {page_no + 1} 0 R "
+            f"/Resources << /Font << /F1 3 0 R >> >> >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for n, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % n + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def _restamp_zip(data: bytes) -> bytes:
+    # python-docx stamps zip entries with the current time; pin them so output is byte-stable
+    out = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(data)) as src, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            dst.writestr(zipfile.ZipInfo(info.filename, EPOCH.timetuple()[:6]), src.read(info), zipfile.ZIP_DEFLATED)
+    return out.getvalue()
+
+
+def write_contract(c: Contract, directory: Path) -> Path:
+    path = directory / c.name
+    if c.fmt == "txt":
+        path.write_text("\n\n".join(c.paragraphs), encoding="utf-8")
+    elif c.fmt == "docx":
+        doc = DocxDocument()
+        for p in c.paragraphs:
+            doc.add_paragraph(p)
+        doc.core_properties.created = doc.core_properties.modified = EPOCH
+        buf = io.BytesIO()
+        doc.save(buf)
+        path.write_bytes(_restamp_zip(buf.getvalue()))
+    else:
+        path.write_bytes(pdf_bytes(c.paragraphs))
+    return path
+
+
+def generate(directory: Path, size: int, seed: int = 42) -> List[Path]:
+    """Write a corpus of `size` contracts; existing files of the same name are reused."""
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for c in contracts(size, seed):
+        path = directory / c.name
+        paths.append(path if path.exists() else write_contract(c, directory))
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--size", default="1k", help="1k | 10k | 100k | a number")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    size = SCALES.get(args.size) or int(args.size)
+    print(f"wrote {len(generate(args.directory, size, args.seed))} contracts to {args.directory}")
@@ -0,0 +1,84 @@
+"""
+Cold-start profile of an API worker: how long `import app.main` takes in a
+fresh interpreter, its peak RSS, which heavy libraries it loaded, and where
+the import time goes (python -X importtime, grouped by top-level package).
+
+    cd backend && python -m benchmarks.import_profile [--top 15]
+"""
+import argparse
+import json
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+BACKEND = Path(__file__).resolve().parent.parent
+# loaded on first use (uploads, facets, QA); a worker that only serves queries should not import them
+LAZY_MODULES = ("pdfminer", "docx", "lxml", "numpy")
+
+_PROBE = f"""
+import json, resource, sys, time
+started = time.perf_counter()
+import app.main
+seconds = time.perf_counter() - started
+try:  # VmHWM starts afresh at exec; ru_maxrss can carry over a forking parent's peak
+    with open("/proc/self/status") as f:
+        rss_kb = next(int(l.split()[1]) for l in f if l.startswith("VmHWM:"))
+except OSError:
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # kilobytes on Linux
+print(json.dumps({{
+    "seconds": seconds,
+    "rss_mb": rss_kb / 1024,
+    "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+class ColdStart(NamedTuple):
+    seconds: float
+    rss_mb: float
+    loaded: List[str]  # LAZY_MODULES that were imported anyway
+
+
+def measure_cold_start() -> ColdStart:
+    """Import app.main in a fresh interpreter and report time, peak RSS and eagerly loaded heavy modules."""
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE], cwd=BACKEND, capture_output=True, text=True, check=True,
+    ).stdout
+    return ColdStart(**json.loads(out.strip().splitlines()[-1]))
+
+
+def import_times() -> List[Tuple[str, int, int]]:
+    """(module, self µs, cumulative µs) for every module `import app.main` loads."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def by_package(rows: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    totals: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in rows:
+        totals[name.split(".")[0]] += self_us
+    return dict(sorted(totals.items(), key=lambda kv: -kv[1]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    cold = measure_cold_start()
+    print(f"import app.main: {cold.seconds * 1000:.0f} ms, peak RSS {cold.rss_mb:.1f} MB")
+    print(f"heavy modules loaded eagerly: {', '.join(cold.loaded) or 'none'}")
+    print(f"\n{'package':32} {'self ms':>10}")
+    for package, us in list(by_package(import_times()).items())[:args.top]:
+        print(f"{package:32} {us / 1000:>10.1f}")
@@ -0,0 +1,146 @@
+"""
+Per-request middleware overhead: the previous stack of six BaseHTTPMiddleware
+classes vs. the fused pure-ASGI EdgeMiddleware, against a bare app.
+
+Requests are driven straight through the ASGI interface (no server, no
+sockets), so the numbers isolate middleware cost.
+
+    cd backend && python -m benchmarks.middleware_overhead [--requests 5000]
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from starlette import status
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.config import settings
+from app.core.logging import set_request_id
+from app.core.metrics import LATENCY, REQUESTS
+from app.main import EdgeMiddleware
+from app.services.ratelimit import build_rate_limiter, retry_after
+
+MAX_REQUESTS = 10**9  # never rate limited: measure the bookkeeping, not 429s
+
+
+# --- the stack EdgeMiddleware replaced (kept here as the baseline) ---
+
+class RequestContextMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        set_request_id(str(uuid.uuid4()))
+        start = time.time()
+        response = await call_next(request)
+        REQUESTS.labels(request.method, request.url.path, response.status_code).inc()
+        LATENCY.labels(request.url.path).observe(time.time() - start)
+        return response
+
+
+class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        response.headers.setdefault("X-Content-Type-Options", "nosniff")
+        response.headers.setdefault("X-Frame-Options", "DENY")
+        response.headers.setdefault("Referrer-Policy", "no-referrer")
+        response.headers.setdefault("Content-Security-Policy", "default-src 'self'")
+        return response
+
+
+class SizeLimitMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        cl = request.headers.get("content-length")
+        if cl and cl.isdigit() and int(cl) > settings.MAX_UPLOAD_MB * 1024 * 1024:
+            return JSONResponse({"detail": "Request too large"}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        return await call_next(request)
+
+
+class ContentTypeCheckMiddleware(BaseHTTPMiddleware):
+    ALLOWED = {"application/json", "multipart/form-data", "text/plain"}
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method in ("POST", "PUT", "PATCH"):
+            ctype = request.headers.get("content-type", "").split(";")[0].strip().lower()
+            if not any(ctype.startswith(a) for a in self.ALLOWED):
+                return JSONResponse({"detail": "Unsupported Media Type"}, status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        return await call_next(request)
+
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, window_s: int = 60, max_requests: int = 120):
+        super().__init__(app)
+        self.limiter = build_rate_limiter(window_s, max_requests)
+
+    async def dispatch(self, request: Request, call_next):
+        wait = self.limiter.acquire(request.client.host if request.client else "unknown")
+        if wait > 0:
+            return JSONResponse({"detail": "Too Many Requests"}, status_code=429, headers={"Retry-After": retry_after(wait)})
+        return await call_next(request)
+
+
+class TimeoutMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, timeout_s: Optional[int] = None):
+        super().__init__(app)
+        self.timeout_s = timeout_s or settings.REQUEST_TIMEOUT_S
+
+    async def dispatch(self, request: Request, call_next):
+        try:
+            return await asyncio.wait_for(call_next(request), timeout=self.timeout_s)
+        except asyncio.TimeoutError:
+            return JSONResponse({"detail": "Request timeout"}, status_code=status.HTTP_408_REQUEST_TIMEOUT)
+
+
+def build(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    if stack == "legacy":
+        app.add_middleware(RequestContextMiddleware)
+        app.add_middleware(RateLimitMiddleware, window_s=60, max_requests=MAX_REQUESTS)
+        app.add_middleware(SizeLimitMiddleware)
+        app.add_middleware(ContentTypeCheckMiddleware)
+        app.add_middleware(TimeoutMiddleware)
+        app.add_middleware(SecurityHeadersMiddleware)
+    elif stack == "fused":
+        app.add_middleware(EdgeMiddleware, window_s=60, max_requests=MAX_REQUESTS)
+    return app
+
+
+async def drive(app: FastAPI, n: int) -> float:
+    """Seconds per request for `n` sequential GET /ping calls."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/ping", "raw_path": b"/ping", "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 5000), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(min(n, 200)):  # warm up
+        await app(dict(scope), receive, send)
+    start = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / n
+
+
+async def main(n: int) -> None:
+    results = {stack: await drive(build(stack), n) for stack in ("bare", "legacy", "fused")}
+    bare = results["bare"]
+    for stack, per_request in results.items():
+        print(f"{stack:>7}: {per_request * 1e6:8.1f} us/request   overhead {(per_request - bare) * 1e6:7.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    asyncio.run(main(parser.parse_args().requests))
@@ -0,0 +1,268 @@
+"""
+End-to-end benchmark suite on a synthetic legal corpus (see corpus.py).
+
+Measures, against a fresh database:
+  - upload throughput: files and MB per second from the first upload
+    request until every ingestion job has finished (extraction included)
+  - extraction cost per file, by kind (pdf/docx/text), and metadata
+    classification per document, called directly (no pool, no queue)
+  - /query/documents and /dashboard latency, p50/p99
+
+Requests go straight through the ASGI app (no server, no sockets) with
+response caches disabled, so the numbers are the cost of doing the work.
+Results are written as JSON and compared against the stored baseline for
+the same scale; any metric worse by more than --threshold fails the run.
+
+    cd backend && python -m benchmarks.suite --size 1k
+    cd backend && python -m benchmarks.suite --size 1k --save-baseline
+
+Baselines are machine-specific: record one on the machine (or CI runner
+class) that will run the comparison.
+"""
+import argparse
+import asyncio
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import orjson
+
+HERE = Path(__file__).resolve().parent
+BASELINE_FILE = HERE / "baseline.json"
+RESULTS_DIR = HERE / "results"
+CORPUS_DIR = HERE / ".corpus"
+
+# throughput metrics regress when they drop; everything else is a latency
+HIGHER_IS_BETTER = {"upload_files_per_s", "upload_mb_per_s"}
+# latency changes smaller than this are timer noise, whatever the percentage
+MIN_DELTA_MS = 0.5
+
+QUESTIONS = [
+    "Which agreements are governed by UAE law?",
+    "Show NDAs under UK law",
+    "Franchise agreements in the Middle East",
+    "Healthcare contracts governed by Delaware law",
+    "Supplier agreements in the oil and gas industry",
+    "employment contracts in Asia",
+    "Which MSAs are in the technology sector?",
+    "confidential information arbitration",
+    "termination notice days",
+    "insurance force majeure",
+]
+CONTENT_TYPES = {
+    "txt": "text/plain",
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+
+def _configure(workdir: Path) -> None:
+    # settings are read at import time, so this runs before anything from app/ is imported
+    os.environ.update({
+        "DATABASE_URL": f"sqlite+aiosqlite:///{workdir / 'bench.db'}",
+        "DATA_DIR": str(workdir / "data"),
+        "UPLOAD_DIR": str(workdir / "uploads"),
+        "RATE_LIMIT_MAX_REQUESTS": str(10**9),
+        "RESPONSE_CACHE_SIZE": "0",
+        "QUERY_RESULT_CACHE_SIZE": "0",
+        "INGEST_POLL_INTERVAL_S": "0.05",
+    })
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def _ms(samples: Sequence[float], name: str) -> Dict[str, float]:
+    return {
+        f"{name}_ms_p50": round(percentile(samples, 50) * 1000, 3),
+        f"{name}_ms_p99": round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+def bench_extraction(paths: Sequence[Path], per_kind: int) -> Dict[str, float]:
+    from app.services.extraction import extract_metadata
+    from app.services.text_utils import extract_text_from_file
+
+    results: Dict[str, float] = {}
+    texts: List[str] = []
+    for fmt, ctype in CONTENT_TYPES.items():
+        samples = []
+        for path in [p for p in paths if p.suffix == f".{fmt}"][:per_kind]:
+            start = time.perf_counter()
+            texts.append(extract_text_from_file(str(path), ctype))
+            samples.append(time.perf_counter() - start)
+        if samples:
+            results[f"extract_{fmt}_ms_p50"] = round(statistics.median(samples) * 1000, 3)
+    samples = []
+    for text in texts:
+        start = time.perf_counter()
+        extract_metadata(text)
+        samples.append(time.perf_counter() - start)
+    results["extract_metadata_ms_p50"] = round(statistics.median(samples) * 1000, 3)
+    return results
+
+
+async def bench_upload(ac, paths: Sequence[Path], batch: int) -> Dict[str, float]:
+    from app.core.config import settings
+
+    total_bytes = sum(p.stat().st_size for p in paths)
+    start = time.perf_counter()
+    jobs = []
+    for i in range(0, len(paths), batch):
+        files = [("files", (p.name, p.read_bytes(), CONTENT_TYPES[p.suffix[1:]])) for p in paths[i:i + batch]]
+        r = await ac.post(f"{settings.API_PREFIX}/upload", files=files)
+        r.raise_for_status()
+        jobs.append(r.json()["job_id"])
+    failed = 0
+    for job_id in jobs:
+        while True:
+            status = (await ac.get(f"{settings.API_PREFIX}/upload/jobs/{job_id}")).json()
+            if status["status"] in ("done", "failed"):
+                failed += status["progress"]["failed"]
+                break
+            await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    if failed:
+        print(f"warning: {failed} files failed to ingest", file=sys.stderr)
+    return {
+        "upload_files_per_s": round(len(paths) / elapsed, 2),
+        "upload_mb_per_s": round(total_bytes / 1024 / 1024 / elapsed, 3),
+    }
+
+
+async def _latencies(ac, requests: int, make_request) -> List[float]:
+    samples = []
+    for i in range(requests):
+        start = time.perf_counter()
+        r = await make_request(i)
+        samples.append(time.perf_counter() - start)
+        r.raise_for_status()
+    return samples
+
+
+async def bench_endpoints(ac, requests: int, rounds: int) -> Dict[str, float]:
+    """Latency percentiles per endpoint; each is the best of `rounds` rounds, which damps scheduler noise."""
+    from app.core.config import settings
+
+    prefix = settings.API_PREFIX
+    await ac.get(f"{prefix}/dashboard")  # warm the connection pools and statement caches
+    best: Dict[str, float] = {}
+    for _ in range(rounds):
+        query = await _latencies(ac, requests, lambda i: ac.get(
+            f"{prefix}/query/documents", params={"question": QUESTIONS[i % len(QUESTIONS)]}
+        ))
+        dashboard = await _latencies(ac, requests, lambda i: ac.get(f"{prefix}/dashboard"))
+        for name, value in {**_ms(query, "query"), **_ms(dashboard, "dashboard")}.items():
+            best[name] = min(value, best.get(name, value))
+    return best
+
+
+async def _run_app(paths: Sequence[Path], batch: int, requests: int, rounds: int) -> Dict[str, float]:
+    from httpx import AsyncClient
+
+    from app.db import init_db
+    from app.main import app
+    from app.services.extract_pool import shutdown_extraction_pool
+    from app.services.ingestion import get_ingest_queue
+
+    init_db()
+    queue = get_ingest_queue()
+    queue.start()
+    try:
+        async with AsyncClient(app=app, base_url="http://bench") as ac:
+            return {**await bench_upload(ac, paths, batch), **await bench_endpoints(ac, requests, rounds)}
+    finally:
+        queue.stop(5)
+        shutdown_extraction_pool()
+
+
+def run(size: int, seed: int, batch: int, requests: int, rounds: int, per_kind: int) -> Dict:
+    from benchmarks.corpus import generate
+
+    paths = generate(CORPUS_DIR / f"{size}-{seed}", size, seed)
+    metrics = bench_extraction(paths, per_kind)
+    metrics.update(asyncio.run(_run_app(paths, batch, requests, rounds)))
+    return {
+        "meta": {
+            "size": size,
+            "seed": seed,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "metrics": metrics,
+    }
+
+
+def compare(metrics: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """Human-readable regressions: metrics worse than baseline by more than `threshold` (a fraction)."""
+    regressions = []
+    for name, base in sorted(baseline.items()):
+        if name not in metrics or not base:
+            continue
+        change = (metrics[name] - base) / base
+        worse = -change if name in HIGHER_IS_BETTER else change
+        if name.endswith(("_ms_p50", "_ms_p99")) and metrics[name] - base < MIN_DELTA_MS:
+            continue
+        if worse > threshold:
+            regressions.append(f"{name}: {base} -> {metrics[name]} ({worse:+.0%} worse)")
+    return regressions
+
+
+def main() -> int:
+    from benchmarks.corpus import SCALES  # does not load app settings, so _configure still applies
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="1k", help="1k | 10k | 100k | a number")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch", type=int, default=50, help="files per upload request")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument("--rounds", type=int, default=3, help="latency rounds; the best round is reported")
+    parser.add_argument("--per-kind", type=int, default=50, help="files per kind in the extraction benchmark")
+    parser.add_argument("--out", type=Path, help="results file (default benchmarks/results/<size>-<time>.json)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed regression, as a fraction")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline for this size")
+    args = parser.parse_args()
+    size = SCALES.get(args.size) or int(args.size)
+
+    with tempfile.TemporaryDirectory(prefix="legal-intel-bench-") as workdir:
+        _configure(Path(workdir))
+        results = run(size, args.seed, args.batch, args.requests, args.rounds, args.per_kind)
+
+    out = args.out or RESULTS_DIR / f"{size}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+    for name, value in sorted(results["metrics"].items()):
+        print(f"{name:28} {value:>12}")
+    print(f"results: {out}")
+
+    baselines = orjson.loads(args.baseline.read_bytes()) if args.baseline.exists() else {}
+    key = str(size)
+    if args.save_baseline:
+        baselines[key] = results
+        args.baseline.write_bytes(orjson.dumps(baselines, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+        print(f"baseline for size {size} saved to {args.baseline}")
+        return 0
+    if key not in baselines:
+        print(f"no baseline for size {size} in {args.baseline}; run with --save-baseline to record one")
+        return 0
+    regressions = compare(results["metrics"], baselines[key]["metrics"], args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"no regressions beyond {args.threshold:.0%} against baseline {baselines[key]['meta']['timestamp']}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
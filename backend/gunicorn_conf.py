@@ -0,0 +1,88 @@
+"""
+Gunicorn settings for multi-worker serving: `gunicorn -c gunicorn_conf.py app.main:app`.
+
+The app is imported once in the master (preload) and the schema set up there
+before any worker forks, so workers start in milliseconds and never race each
+other through migrations. Workers share MULTIPROC_DIR: Prometheus writes each
+worker's samples there (/metrics aggregates them) and app.core.inflight keeps
+per-worker in-flight counts and the drain marker there.
+
+Environment: BIND, WEB_CONCURRENCY (workers, default one per core),
+MULTIPROC_DIR (default a fresh directory under the system temp dir).
+Note EXTRACT_WORKERS and INGEST_CONCURRENCY apply per worker.
+"""
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+_DEFAULT_DIR = os.path.join(tempfile.gettempdir(), f"legal-intel-{os.getpid()}")
+
+# Before the app (and prometheus_client) is imported: the metric value class is
+# chosen at import, and preload imports the app before any server hook runs.
+if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:  # first load; a HUP re-reads this file in the same master
+    _dir = os.getenv("MULTIPROC_DIR") or _DEFAULT_DIR
+    os.makedirs(_dir, exist_ok=True)
+    # samples, counts and a drain marker left by a previous run would leak into this one. Only
+    # names prometheus_client and app.core.inflight write: the directory may hold other files.
+    for _pattern in ("counter_*.db", "gauge_*.db", "histogram_*.db", "summary_*.db", "inflight_[0-9]*", "draining"):
+        for _path in glob.glob(os.path.join(_dir, _pattern)):
+            os.remove(_path)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = _dir
+MULTIPROC_DIR = os.environ.setdefault("MULTIPROC_DIR", os.environ["PROMETHEUS_MULTIPROC_DIR"])
+
+from app.core.config import settings  # noqa: E402  (reads the environment set above)
+
+bind = os.getenv("BIND", "127.0.0.1:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# a worker's shutdown waits for its requests, then for its ingestion jobs: up to two grace periods
+graceful_timeout = 2 * settings.SHUTDOWN_GRACE_PERIOD_S + 5
+timeout = max(60, settings.REQUEST_TIMEOUT_S * 2)
+accesslog = None  # requests are logged and counted by the app
+errorlog = "-"
+
+
+def when_ready(server):
+    # master, after preload and before the first fork
+    if server.cfg.preload_app:
+        from app.db import INIT_DB_DONE_ENV, init_db
+        from app.db.engine import after_fork
+
+        init_db()
+        os.environ[INIT_DB_DONE_ENV] = "1"  # inherited by every worker: their startup skips init_db()
+        after_fork()  # nothing pooled in the master for workers to inherit
+
+    stop = server.stop
+
+    def drain_then_stop(graceful=True):
+        from app.core.inflight import begin_server_drain
+
+        begin_server_drain(MULTIPROC_DIR)  # every worker's /readyz now answers 503
+        if graceful and settings.SHUTDOWN_DRAIN_DELAY_S > 0:
+            time.sleep(settings.SHUTDOWN_DRAIN_DELAY_S)  # let load balancers notice before workers stop accepting
+        stop(graceful)
+
+    server.stop = drain_then_stop
+
+
+def post_fork(server, worker):
+    from app.db.engine import after_fork
+
+    after_fork()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    from app.core.inflight import forget_worker
+
+    multiprocess.mark_process_dead(worker.pid, MULTIPROC_DIR)
+    forget_worker(MULTIPROC_DIR, worker.pid)
+
+
+def on_exit(server):
+    if MULTIPROC_DIR == _DEFAULT_DIR:
+        shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)